@@ -0,0 +1,118 @@
+import os
+import queue
+import threading
+from datetime import datetime
+from sqlalchemy import insert
+from .database import engine
+from .models import ActividadLogin
+
+# ==========================================
+# ⚙️ CONFIGURACIÓN
+# ==========================================
+AUDITORIA_BUFFER_MAX = int(os.getenv("AUDITORIA_BUFFER_MAX", "10000"))
+# Filas por INSERT multi-fila (SQL Server admite máx. 2100 parámetros)
+AUDITORIA_LOTE = int(os.getenv("AUDITORIA_LOTE", "200"))
+AUDITORIA_INTERVALO_SEGUNDOS = float(os.getenv("AUDITORIA_INTERVALO_SEGUNDOS", "2"))
+
+
+class AuditoriaLogin:
+    """
+    Buffer en memoria de eventos de login que un hilo en segundo plano
+    escribe en `actividad_login` con INSERTs multi-fila, cuando se junta
+    un lote completo o pasa AUDITORIA_INTERVALO_SEGUNDOS.
+
+    Registrar nunca bloquea la petición: si el buffer está lleno el evento
+    se descarta y se cuenta en `descartados`.
+
+    La tabla se crea con sql/001_actividad_login.sql; si falta, los lotes
+    fallan y se cuentan en `errores` sin afectar al login.
+    """
+
+    def __init__(self):
+        self._cola = queue.Queue(maxsize=AUDITORIA_BUFFER_MAX)
+        self._despertar = threading.Event()
+        self._parar = threading.Event()
+        self._hilo = None
+        self._lock = threading.Lock()
+        self.descartados = 0
+        self.escritos = 0
+        self.errores = 0
+
+    def registrar(self, evento: str, exito: bool, usuario_id: int = None,
+                  usuario: str = None, detalle: str = None):
+        """Encola un evento (no toca la base de datos)."""
+        fila = {
+            "usuario_id": usuario_id,
+            "usuario": usuario,
+            "evento": evento,
+            "exito": exito,
+            "detalle": detalle[:200] if detalle else None,
+            "fecha": datetime.utcnow(),
+        }
+        try:
+            self._cola.put_nowait(fila)
+        except queue.Full:
+            with self._lock:
+                self.descartados += 1
+            return
+        # Lote completo → vaciar sin esperar al intervalo
+        if self._cola.qsize() >= AUDITORIA_LOTE:
+            self._despertar.set()
+
+    def vaciar(self):
+        """Escribe todo lo pendiente en lotes de AUDITORIA_LOTE filas."""
+        while True:
+            filas = []
+            while len(filas) < AUDITORIA_LOTE:
+                try:
+                    filas.append(self._cola.get_nowait())
+                except queue.Empty:
+                    break
+            if not filas:
+                return
+            try:
+                with engine.begin() as conexion:
+                    conexion.execute(insert(ActividadLogin).values(filas))
+                with self._lock:
+                    self.escritos += len(filas)
+            except Exception as e:
+                with self._lock:
+                    self.errores += 1
+                    self.descartados += len(filas)
+                print(f"❌ Error escribiendo auditoría ({len(filas)} eventos): {e}")
+                return
+
+    def _bucle(self):
+        while not self._parar.is_set():
+            self._despertar.wait(AUDITORIA_INTERVALO_SEGUNDOS)
+            self._despertar.clear()
+            self.vaciar()
+
+    def iniciar(self):
+        if self._hilo and self._hilo.is_alive():
+            return
+        self._parar.clear()
+        self._hilo = threading.Thread(target=self._bucle, name="auditoria-login", daemon=True)
+        self._hilo.start()
+
+    def detener(self):
+        """Detiene el hilo y escribe lo que quede en el buffer."""
+        self._parar.set()
+        self._despertar.set()
+        if self._hilo:
+            self._hilo.join(timeout=10)
+            self._hilo = None
+        self.vaciar()
+
+    def estadisticas(self) -> dict:
+        with self._lock:
+            return {
+                "pendientes": self._cola.qsize(),
+                "escritos": self.escritos,
+                "descartados": self.descartados,
+                "errores": self.errores,
+                "capacidad": AUDITORIA_BUFFER_MAX,
+            }
+
+
+auditoria = AuditoriaLogin()
@@ -1,21 +1,37 @@
-from jose import jwt
+from jose import jwt, JWTError
 from datetime import datetime, timedelta
 import os
+import secrets
 from dotenv import load_dotenv
 import pyotp
 import qrcode
 from io import BytesIO
 import base64
+import time
+from functools import lru_cache
+from typing import Optional
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import ec, rsa
 
 load_dotenv()
 
 # ==========================================
 # ⚙️ CONFIGURACIÓN GLOBAL
 # ==========================================
-SECRET_KEY = os.getenv("SECRET_KEY", "clave-secreta-super-segura")
-ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 60
 
+# Claves de firma JWT: un archivo <kid>.pem (EC P-256 o RSA) por clave.
+#   openssl ecparam -name prime256v1 -genkey -noout -out claves_jwt/2026-10.pem
+# Todas se publican en /.well-known/jwks.json; solo la activa firma.
+# Con más de una clave hay que indicar cuál firma con JWT_ACTIVE_KID.
+# Para rotar: agregar la nueva, activarla, y borrar la vieja cuando
+# hayan expirado sus tokens (ACCESS_TOKEN_EXPIRE_MINUTES).
+JWT_KEYS_DIR = os.getenv("JWT_KEYS_DIR", "claves_jwt")
+JWT_ACTIVE_KID = os.getenv("JWT_ACTIVE_KID", "")
+# Solo desarrollo: sin claves en JWT_KEYS_DIR genera una clave efímera por
+# proceso (los tokens no sobreviven a un reinicio ni valen entre workers)
+JWT_CLAVE_TEMPORAL = os.getenv("JWT_CLAVE_TEMPORAL", "false").lower() == "true"
+
 
 # ==========================================
 # 🔑 GESTIÓN DE CONTRASEÑAS
@@ -36,15 +52,134 @@ def verificar_contrasena(plain_password: str, hashed_password: str) -> bool:
     return plain_password == hashed_password
 
 
+# ==========================================
+# 🗝️ CLAVES ASIMÉTRICAS Y JWKS
+# ==========================================
+def _b64url_entero(numero: int, longitud: int = None) -> str:
+    datos = numero.to_bytes(longitud or (numero.bit_length() + 7) // 8, "big")
+    return base64.urlsafe_b64encode(datos).rstrip(b"=").decode()
+
+
+def _describir_clave(kid: str, privada) -> dict:
+    """Devuelve PEMs, algoritmo y JWK público de una clave privada."""
+    publica = privada.public_key()
+    numeros = publica.public_numbers()
+    if isinstance(privada, ec.EllipticCurvePrivateKey):
+        if not isinstance(privada.curve, ec.SECP256R1):
+            raise ValueError(f"Clave {kid}: solo se admite la curva P-256 (ES256)")
+        alg = "ES256"
+        jwk = {"kty": "EC", "crv": "P-256", "x": _b64url_entero(numeros.x, 32), "y": _b64url_entero(numeros.y, 32)}
+    elif isinstance(privada, rsa.RSAPrivateKey):
+        alg = "RS256"
+        jwk = {"kty": "RSA", "n": _b64url_entero(numeros.n), "e": _b64url_entero(numeros.e)}
+    else:
+        raise ValueError(f"Clave {kid}: tipo no soportado (usar EC P-256 o RSA)")
+
+    jwk.update({"kid": kid, "alg": alg, "use": "sig"})
+    return {
+        "alg": alg,
+        "privada": privada.private_bytes(
+            serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8, serialization.NoEncryption()
+        ).decode(),
+        "publica": publica.public_bytes(
+            serialization.Encoding.PEM, serialization.PublicFormat.SubjectPublicKeyInfo
+        ).decode(),
+        "jwk": jwk,
+    }
+
+
+def _cargar_claves() -> dict:
+    claves = {}
+    if os.path.isdir(JWT_KEYS_DIR):
+        for archivo in sorted(os.listdir(JWT_KEYS_DIR)):
+            if archivo.endswith(".pem"):
+                with open(os.path.join(JWT_KEYS_DIR, archivo), "rb") as f:
+                    privada = serialization.load_pem_private_key(f.read(), password=None)
+                kid = archivo[:-4]
+                claves[kid] = _describir_clave(kid, privada)
+
+    if not claves:
+        if not JWT_CLAVE_TEMPORAL:
+            raise RuntimeError(
+                f"No hay claves JWT en {JWT_KEYS_DIR}/ (usar JWT_CLAVE_TEMPORAL=true solo en desarrollo)"
+            )
+        kid = f"temporal-{secrets.token_hex(4)}"
+        print(f"⚠️ No hay claves en {JWT_KEYS_DIR}/, usando clave ES256 temporal ({kid})")
+        claves[kid] = _describir_clave(kid, ec.generate_private_key(ec.SECP256R1()))
+    return claves
+
+
+def _elegir_kid_activo(claves: dict) -> str:
+    if not JWT_ACTIVE_KID:
+        if len(claves) > 1:
+            raise RuntimeError(f"Hay {len(claves)} claves en {JWT_KEYS_DIR}/: indicar la que firma con JWT_ACTIVE_KID")
+        return next(iter(claves))
+    if JWT_ACTIVE_KID not in claves:
+        raise RuntimeError(f"JWT_ACTIVE_KID={JWT_ACTIVE_KID} no existe en {JWT_KEYS_DIR}/")
+    return JWT_ACTIVE_KID
+
+
+CLAVES_JWT = _cargar_claves()
+KID_ACTIVO = _elegir_kid_activo(CLAVES_JWT)
+ALGORITHM = CLAVES_JWT[KID_ACTIVO]["alg"]
+
+# Documento JWKS precalculado (se sirve tal cual en /.well-known/jwks.json)
+JWKS = {"keys": [clave["jwk"] for clave in CLAVES_JWT.values()]}
+
+
 # ==========================================
 # 🧾 GENERACIÓN DE TOKENS JWT
 # ==========================================
 def crear_token(data: dict) -> str:
-    """Genera un token JWT firmado con la clave secreta."""
+    """Genera un token JWT firmado con la clave privada activa (header `kid`)."""
     to_encode = data.copy()
     expire = datetime.utcnow() + timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
     to_encode.update({"exp": expire})
-    return jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
+    return jwt.encode(
+        to_encode, CLAVES_JWT[KID_ACTIVO]["privada"], algorithm=ALGORITHM, headers={"kid": KID_ACTIVO}
+    )
+
+
+def verificar_token(token: str) -> dict:
+    """
+    Verifica firma y expiración con la clave pública indicada por `kid`.
+    Lanza JWTError si el token no es válido.
+    """
+    kid = jwt.get_unverified_header(token).get("kid")
+    if not isinstance(kid, str):
+        raise JWTError("kid inválido")  # un kid lista/objeto no es hashable
+    clave = CLAVES_JWT.get(kid)
+    if clave is None:
+        raise JWTError("kid desconocido")
+    return jwt.decode(token, clave["publica"], algorithms=[clave["alg"]])
+
+
+@lru_cache(maxsize=4096)
+def _verificar_firma_cacheada(token: str):
+    """Verifica la firma una sola vez por token; devuelve (claims, error)."""
+    try:
+        return verificar_token(token), None
+    except JWTError as e:
+        return None, str(e)
+
+
+def verificar_token_cacheado(token: str):
+    """
+    Igual que verificar_token pero reutiliza verificaciones anteriores.
+    La expiración se vuelve a comprobar en cada llamada. Devuelve (claims, error).
+    """
+    claims, error = _verificar_firma_cacheada(token)
+    if claims is not None and claims.get("exp") is not None and claims["exp"] <= time.time():
+        return None, "Signature has expired."
+    return claims, error
+
+
+def usuario_del_token(token: str) -> Optional[str]:
+    """`sub` de un token válido (firma y expiración) o None."""
+    if not token:
+        return None
+    claims, _ = verificar_token_cacheado(token)
+    return claims.get("sub") if claims else None
 
 
 # Alias para compatibilidad con otros archivos
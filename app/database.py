@@ -1,8 +1,13 @@
-from sqlalchemy import create_engine, MetaData
+from sqlalchemy import create_engine, MetaData, event, exc
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.orm import sessionmaker, Session
+import functools
+import inspect
+import itertools
 import os
+import time
 from dotenv import load_dotenv
+from .resiliencia import CircuitBreaker
 
 load_dotenv()
 
@@ -13,14 +18,153 @@ DB_USER = os.getenv("DB_USER")
 DB_PASSWORD = os.getenv("DB_PASSWORD")
 DB_PORT = os.getenv("DB_PORT", "1433")
 
-# Cadena de conexión
-DATABASE_URL = f"mssql+pyodbc://{DB_USER}:{DB_PASSWORD}@{DB_SERVER}:{DB_PORT}/{DB_NAME}?driver=ODBC+Driver+17+for+SQL+Server"
+# Cadena de conexión (primaria: recibe todas las escrituras)
+DATABASE_URL = os.getenv(
+    "DATABASE_URL",
+    f"mssql+pyodbc://{DB_USER}:{DB_PASSWORD}@{DB_SERVER}:{DB_PORT}/{DB_NAME}?driver=ODBC+Driver+17+for+SQL+Server"
+)
+
+# Réplicas de solo lectura, separadas por comas (opcional)
+DATABASE_REPLICA_URLS = [
+    url.strip() for url in os.getenv("DATABASE_REPLICA_URLS", "").split(",") if url.strip()
+]
+# Segundos que una réplica con fallos queda fuera de rotación
+REPLICA_RETRY_SECONDS = float(os.getenv("REPLICA_RETRY_SECONDS", "30"))
+
+# Plazos: abrir conexión, ejecutar una consulta y esperar una conexión libre del pool
+DB_CONNECT_TIMEOUT = int(os.getenv("DB_CONNECT_TIMEOUT", "5"))
+DB_QUERY_TIMEOUT = int(os.getenv("DB_QUERY_TIMEOUT", "15"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "10"))
 
 metadata = MetaData()
 
-engine = create_engine(DATABASE_URL, echo=True)
 
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+def _crear_engine(url: str, **kwargs):
+    """Crea un engine con plazos; SQLite necesita compartir conexiones entre hilos."""
+    if url.startswith("sqlite"):
+        kwargs.setdefault("connect_args", {"check_same_thread": False, "timeout": DB_QUERY_TIMEOUT})
+    elif url.startswith("mssql+pyodbc"):
+        kwargs.setdefault("connect_args", {"timeout": DB_CONNECT_TIMEOUT})
+    nuevo_engine = create_engine(url, echo=True, pool_timeout=DB_POOL_TIMEOUT, **kwargs)
+
+    if url.startswith("mssql+pyodbc"):
+        @event.listens_for(nuevo_engine, "connect")
+        def _timeout_consultas(conexion_dbapi, registro):
+            conexion_dbapi.timeout = DB_QUERY_TIMEOUT  # pyodbc: plazo por consulta
+
+    return nuevo_engine
+
+
+engine = _crear_engine(DATABASE_URL)
+
+# ==========================================
+# 🔌 CIRCUITO DE LA PRIMARIA
+# ==========================================
+circuito_db = CircuitBreaker("base_datos", timeout=DB_QUERY_TIMEOUT)
+
+
+@event.listens_for(engine, "handle_error")
+def _fallo_primaria(contexto):
+    if contexto.is_disconnect or isinstance(
+        contexto.sqlalchemy_exception, (exc.OperationalError, exc.InterfaceError, exc.TimeoutError)
+    ):
+        circuito_db.fallo()
+
+
+@event.listens_for(engine, "after_cursor_execute")
+def _exito_primaria(conexion, cursor, sentencia, parametros, contexto, executemany):
+    circuito_db.exito()
+
+# ==========================================
+# 📚 RÉPLICAS DE LECTURA
+# ==========================================
+replicas = [
+    {"url": url, "engine": _crear_engine(url, pool_pre_ping=True), "caida_hasta": 0.0}
+    for url in DATABASE_REPLICA_URLS
+]
+_turno_replica = itertools.count()
+
+
+def _registrar_fallo_replica(replica: dict):
+    def handle_error(contexto):
+        if contexto.is_disconnect or isinstance(
+            contexto.sqlalchemy_exception, (exc.OperationalError, exc.InterfaceError)
+        ):
+            replica["caida_hasta"] = time.monotonic() + REPLICA_RETRY_SECONDS
+            print(f"⚠️ Réplica fuera de rotación por {REPLICA_RETRY_SECONDS}s: {contexto.original_exception}")
+    return handle_error
+
+
+for _replica in replicas:
+    event.listen(_replica["engine"], "handle_error", _registrar_fallo_replica(_replica))
+
+
+def elegir_replica():
+    """Devuelve el engine de una réplica sana (round-robin) o None si no hay ninguna."""
+    if not replicas:
+        return None
+    ahora = time.monotonic()
+    inicio = next(_turno_replica)
+    for i in range(len(replicas)):
+        replica = replicas[(inicio + i) % len(replicas)]
+        if replica["caida_hasta"] <= ahora:
+            return replica["engine"]
+    return None
+
+
+def _replica_expulsada(replica_engine) -> bool:
+    ahora = time.monotonic()
+    return any(r["engine"] is replica_engine and r["caida_hasta"] > ahora for r in replicas)
+
+
+class SesionEnrutada(Session):
+    """
+    Sesión que envía las lecturas a una réplica cuando está marcada como
+    solo lectura; la réplica se elige una vez y se mantiene mientras no la
+    saquen de rotación. Tras cualquier flush/commit vuelve a la primaria para
+    leer lo que acaba de escribir (read-your-writes). Si la réplica falla
+    con un error de conexión, la lectura se reintenta una vez.
+    """
+
+    def get_bind(self, mapper=None, clause=None, **kwargs):
+        if self.info.get("solo_lectura") and not self._flushing and not self.info.get("escribio"):
+            # Una réplica por sesión: réplicas con distinto retraso no mezclan lecturas
+            replica = self.info.get("replica_en_uso")
+            if replica is None or _replica_expulsada(replica):
+                replica = elegir_replica()
+            if replica is not None:
+                self.info["replica_en_uso"] = replica
+                return replica
+        self.info.pop("replica_en_uso", None)
+        # Con el circuito abierto se falla al instante (CircuitoAbierto → 503).
+        # Se comprueba una vez por sesión para que una sonda semiabierta complete su petición.
+        if not self.info.get("primaria_permitida"):
+            circuito_db.verificar()
+            self.info["primaria_permitida"] = True
+        return engine
+
+    def execute(self, *args, **kwargs):
+        try:
+            return super().execute(*args, **kwargs)
+        except (exc.OperationalError, exc.InterfaceError):
+            replica = self.info.pop("replica_en_uso", None)
+            if replica is None or not _replica_expulsada(replica):
+                raise
+            # La réplica acaba de quedar fuera de rotación: se repite la lectura
+            # una vez en otra réplica sana o en la primaria en lugar de devolver 500.
+            self.rollback()
+            return super().execute(*args, **kwargs)
+
+
+@event.listens_for(SesionEnrutada, "after_flush")
+def _marcar_escritura(sesion, contexto_flush):
+    sesion.info["escribio"] = True
+
+
+SessionLocal = sessionmaker(autocommit=False, autoflush=False, class_=SesionEnrutada)
+SessionLectura = sessionmaker(
+    autocommit=False, autoflush=False, class_=SesionEnrutada, info={"solo_lectura": True}
+)
 Base = declarative_base()
 
 def get_db():
@@ -28,4 +172,55 @@ def get_db():
     try:
         yield db
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
+
+
+def get_db_lectura():
+    """Sesión para rutas de solo lectura: consulta réplicas si están configuradas."""
+    db = SessionLectura()
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+def get_db_transaccional():
+    """Sesión de las rutas @transaccional (no expira los objetos al confirmar)."""
+    db = SessionLocal(expire_on_commit=False)
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+def transaccional(ruta):
+    """
+    Unidad de trabajo por petición: un solo commit cuando la ruta termina
+    bien y rollback si lanza cualquier excepción (incluida HTTPException).
+    El commit ocurre dentro del endpoint, antes de serializar la respuesta,
+    así que si falla el cliente recibe 500 y no un 200 sin datos guardados.
+    La ruta debe recibir la sesión como `db`.
+    """
+    if inspect.iscoroutinefunction(ruta):
+        @functools.wraps(ruta)
+        async def envoltura(*args, **kwargs):
+            db = kwargs["db"]
+            try:
+                resultado = await ruta(*args, **kwargs)
+                db.commit()
+            except Exception:
+                db.rollback()
+                raise
+            return resultado
+    else:
+        @functools.wraps(ruta)
+        def envoltura(*args, **kwargs):
+            db = kwargs["db"]
+            try:
+                resultado = ruta(*args, **kwargs)
+                db.commit()
+            except Exception:
+                db.rollback()
+                raise
+            return resultado
+    return envoltura
@@ -0,0 +1,99 @@
+import asyncio
+import os
+import threading
+from sqlalchemy import event
+from .database import SesionEnrutada
+
+# ==========================================
+# ⚙️ CONFIGURACIÓN
+# ==========================================
+SSE_MAX_CONEXIONES = int(os.getenv("SSE_MAX_CONEXIONES", "1000"))  # por worker
+SSE_MAX_POR_USUARIO = int(os.getenv("SSE_MAX_POR_USUARIO", "3"))
+SSE_COLA_MAX = 20  # eventos pendientes por conexión; si se llena se descartan
+
+
+class HubEventos:
+    """
+    Pub/sub en memoria (un hub por worker). Cada conexión SSE es una
+    asyncio.Queue; publicar() puede llamarse desde cualquier hilo.
+    """
+
+    def __init__(self):
+        self._suscriptores = {}  # usuario_id -> set de (loop, cola)
+        self._lock = threading.Lock()
+        self.total = 0
+
+    def hay_cupo(self, usuario_id: int) -> bool:
+        """Comprobación previa para responder 429 antes de abrir el stream."""
+        with self._lock:
+            propias = self._suscriptores.get(usuario_id, ())
+            return self.total < SSE_MAX_CONEXIONES and len(propias) < SSE_MAX_POR_USUARIO
+
+    def suscribir(self, usuario_id: int):
+        """Devuelve (loop, cola) o None si se alcanzó algún límite de conexiones."""
+        with self._lock:
+            propias = self._suscriptores.setdefault(usuario_id, set())
+            if self.total >= SSE_MAX_CONEXIONES or len(propias) >= SSE_MAX_POR_USUARIO:
+                if not propias:
+                    del self._suscriptores[usuario_id]
+                return None
+            suscripcion = (asyncio.get_running_loop(), asyncio.Queue(maxsize=SSE_COLA_MAX))
+            propias.add(suscripcion)
+            self.total += 1
+            return suscripcion
+
+    def cancelar(self, usuario_id: int, suscripcion):
+        with self._lock:
+            propias = self._suscriptores.get(usuario_id)
+            if propias and suscripcion in propias:
+                propias.discard(suscripcion)
+                self.total -= 1
+                if not propias:
+                    del self._suscriptores[usuario_id]
+
+    def publicar(self, usuario_id: int, datos: dict):
+        with self._lock:
+            destinos = list(self._suscriptores.get(usuario_id, ()))
+        for loop, cola in destinos:
+            loop.call_soon_threadsafe(_encolar, cola, datos)
+
+    def estadisticas(self) -> dict:
+        with self._lock:
+            return {
+                "conexiones": self.total,
+                "usuarios": len(self._suscriptores),
+                "max_conexiones": SSE_MAX_CONEXIONES,
+                "max_por_usuario": SSE_MAX_POR_USUARIO,
+            }
+
+
+def _encolar(cola: asyncio.Queue, datos: dict):
+    try:
+        cola.put_nowait(datos)
+    except asyncio.QueueFull:
+        pass  # cliente lento: al reconectar recibe el estado completo
+
+
+hub = HubEventos()
+
+
+# ==========================================
+# 📣 PUBLICAR SOLO DESPUÉS DEL COMMIT
+# ==========================================
+def publicar_al_confirmar(db, usuario_id: int, **cambios):
+    """
+    Deja el evento pendiente en la sesión; se publica cuando la transacción
+    se confirma y se descarta si hay rollback.
+    """
+    db.info.setdefault("eventos_pendientes", []).append((usuario_id, cambios))
+
+
+@event.listens_for(SesionEnrutada, "after_commit")
+def _publicar_pendientes(sesion):
+    for usuario_id, cambios in sesion.info.pop("eventos_pendientes", ()):
+        hub.publicar(usuario_id, cambios)
+
+
+@event.listens_for(SesionEnrutada, "after_rollback")
+def _descartar_pendientes(sesion):
+    sesion.info.pop("eventos_pendientes", None)
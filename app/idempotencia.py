@@ -0,0 +1,200 @@
+import asyncio
+import hashlib
+import json
+import os
+import time
+from collections import OrderedDict
+
+# ==========================================
+# ⚙️ CONFIGURACIÓN
+# ==========================================
+IDEMPOTENCIA_TTL_SEGUNDOS = int(os.getenv("IDEMPOTENCIA_TTL_SEGUNDOS", "86400"))
+IDEMPOTENCIA_MAX_CLAVES = int(os.getenv("IDEMPOTENCIA_MAX_CLAVES", "10000"))
+# Tiempo máximo que un duplicado espera a la petición original en curso
+IDEMPOTENCIA_ESPERA_SEGUNDOS = float(os.getenv("IDEMPOTENCIA_ESPERA_SEGUNDOS", "30"))
+# Respuestas más grandes no se guardan (se ejecutan de nuevo)
+IDEMPOTENCIA_MAX_BYTES = int(os.getenv("IDEMPOTENCIA_MAX_BYTES", str(256 * 1024)))
+# Tope de memoria de todas las respuestas guardadas; se descartan las más antiguas
+IDEMPOTENCIA_MAX_BYTES_TOTAL = int(os.getenv("IDEMPOTENCIA_MAX_BYTES_TOTAL", str(32 * 1024 * 1024)))
+HEADER_IDEMPOTENCIA = b"idempotency-key"
+
+# Solo rutas cuyos reintentos repiten escrituras o envíos. El login queda
+# fuera a propósito: no se guardan access tokens en memoria.
+RUTAS_IDEMPOTENTES = frozenset({
+    "/api/auth/registro",
+    "/api/verificacion/enviar-codigo-email",
+    "/api/verificacion/enviar-codigo-sms",
+    "/api/totp/habilitar",
+})
+
+
+class AlmacenTTL:
+    """
+    Diccionario acotado con expiración: descarta lo vencido y, si se supera
+    `max_claves` o `max_bytes` (suma de tamaños declarados), lo más antiguo.
+    """
+
+    def __init__(self, max_claves: int = IDEMPOTENCIA_MAX_CLAVES, ttl: int = IDEMPOTENCIA_TTL_SEGUNDOS,
+                 max_bytes: int = IDEMPOTENCIA_MAX_BYTES_TOTAL):
+        self.max_claves = max_claves
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.bytes = 0
+        self._datos = OrderedDict()
+
+    def obtener(self, clave):
+        entrada = self._datos.get(clave)
+        if entrada is None:
+            return None
+        expira, tamano, valor = entrada
+        if expira <= time.monotonic():
+            del self._datos[clave]
+            self.bytes -= tamano
+            return None
+        return valor
+
+    def guardar(self, clave, valor, tamano: int = 0):
+        anterior = self._datos.pop(clave, None)
+        if anterior is not None:
+            self.bytes -= anterior[1]
+        self._datos[clave] = (time.monotonic() + self.ttl, tamano, valor)
+        self.bytes += tamano
+        while len(self._datos) > self.max_claves or self.bytes > self.max_bytes:
+            _, (_, tamano_viejo, _) = self._datos.popitem(last=False)
+            self.bytes -= tamano_viejo
+
+    def __len__(self):
+        return len(self._datos)
+
+
+almacen = AlmacenTTL()
+_en_curso = {}  # (ruta, clave) -> asyncio.Event de la petición original
+
+
+async def _responder_json(send, status: int, contenido: dict, headers=()):
+    cuerpo = json.dumps(contenido).encode()
+    await send({
+        "type": "http.response.start",
+        "status": status,
+        "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(cuerpo)).encode()), *headers],
+    })
+    await send({"type": "http.response.body", "body": cuerpo})
+
+
+async def _leer_cuerpo(receive) -> bytes:
+    partes = []
+    while True:
+        mensaje = await receive()
+        if mensaje["type"] == "http.disconnect":
+            break
+        partes.append(mensaje.get("body", b""))
+        if not mensaje.get("more_body"):
+            break
+    return b"".join(partes)
+
+
+class MiddlewareIdempotencia:
+    """
+    Middleware ASGI para POST con header Idempotency-Key.
+
+    - La primera petición se ejecuta y su respuesta (status < 500) se guarda
+      IDEMPOTENCIA_TTL_SEGUNDOS.
+    - Los reintentos con la misma clave reciben la respuesta guardada, con
+      el header Idempotent-Replayed: true.
+    - Un duplicado que llega mientras la original está en curso espera a que
+      termine en lugar de ejecutarse otra vez.
+    - Reusar la clave con otro cuerpo devuelve 422.
+
+    Solo aplica a las rutas de `rutas` (por defecto RUTAS_IDEMPOTENTES).
+    """
+
+    def __init__(self, app, rutas=RUTAS_IDEMPOTENTES):
+        self.app = app
+        self.rutas = frozenset(rutas)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] != "POST" or scope["path"] not in self.rutas:
+            return await self.app(scope, receive, send)
+
+        clave = None
+        for nombre, valor in scope["headers"]:
+            if nombre == HEADER_IDEMPOTENCIA:
+                clave = valor.decode("latin-1")
+                break
+        if not clave:
+            return await self.app(scope, receive, send)
+        if len(clave) > 255:
+            return await _responder_json(send, 400, {"detail": "Idempotency-Key demasiado larga"})
+
+        cuerpo = await _leer_cuerpo(receive)
+        huella = hashlib.sha256(cuerpo).hexdigest()
+        identificador = (scope["path"], clave)
+
+        while True:
+            guardada = almacen.obtener(identificador)
+            if guardada is not None:
+                if guardada["huella"] != huella:
+                    return await _responder_json(
+                        send, 422, {"detail": "Idempotency-Key ya usada con otro cuerpo"}
+                    )
+                await send({
+                    "type": "http.response.start",
+                    "status": guardada["status"],
+                    "headers": guardada["headers"] + [(b"idempotent-replayed", b"true")],
+                })
+                await send({"type": "http.response.body", "body": guardada["cuerpo"]})
+                return
+
+            evento = _en_curso.get(identificador)
+            if evento is None:
+                break
+            # Hay una petición idéntica en curso → esperar su resultado
+            try:
+                await asyncio.wait_for(evento.wait(), IDEMPOTENCIA_ESPERA_SEGUNDOS)
+            except asyncio.TimeoutError:
+                return await _responder_json(
+                    send, 409, {"detail": "Hay una petición con esta Idempotency-Key en curso"}
+                )
+            # Si la original falló (5xx) no hay nada guardado y este reintento se ejecuta
+
+        evento = asyncio.Event()
+        _en_curso[identificador] = evento
+
+        cuerpo_entregado = False
+
+        async def receive_repetido():
+            nonlocal cuerpo_entregado
+            if not cuerpo_entregado:
+                cuerpo_entregado = True
+                return {"type": "http.request", "body": cuerpo, "more_body": False}
+            return await receive()
+
+        respuesta = {"status": None, "headers": [], "partes": [], "bytes": 0, "completa": False}
+
+        async def send_capturando(mensaje):
+            if mensaje["type"] == "http.response.start":
+                respuesta["status"] = mensaje["status"]
+                respuesta["headers"] = list(mensaje.get("headers", []))
+            elif mensaje["type"] == "http.response.body":
+                parte = mensaje.get("body", b"")
+                respuesta["bytes"] += len(parte)
+                if respuesta["bytes"] <= IDEMPOTENCIA_MAX_BYTES:
+                    respuesta["partes"].append(parte)
+                if not mensaje.get("more_body"):
+                    respuesta["completa"] = True
+            await send(mensaje)
+
+        try:
+            await self.app(scope, receive_repetido, send_capturando)
+        finally:
+            if (respuesta["completa"] and respuesta["status"] is not None
+                    and respuesta["status"] < 500 and respuesta["bytes"] <= IDEMPOTENCIA_MAX_BYTES):
+                cuerpo_respuesta = b"".join(respuesta["partes"])
+                almacen.guardar(identificador, {
+                    "huella": huella,
+                    "status": respuesta["status"],
+                    "headers": respuesta["headers"],
+                    "cuerpo": cuerpo_respuesta,
+                }, tamano=len(cuerpo_respuesta))
+            del _en_curso[identificador]
+            evento.set()
@@ -1,8 +1,42 @@
-from fastapi import FastAPI
+import json
+import math
+import threading
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
 from .routers import auth, verificacion, totp  # ← Agregar totp
+from .routers import profiling as profiling_admin
+from .routers import eventos
+from .auditoria import auditoria
+from .profiling import MiddlewareProfiling
+from .idempotencia import MiddlewareIdempotencia
+from .auth_utils import JWKS
+from . import precalentamiento
+from .resiliencia import CircuitoAbierto, estado_circuitos
+from . import twilio_service  # noqa: F401  (registra el circuito "sms" para /estado/circuitos)
 
-app = FastAPI(title="Sistema de Autenticación")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Hilo que escribe la auditoría de login en lotes
+    auditoria.iniciar()
+    # Pool y sentencias en segundo plano; /ready avisa cuando termina.
+    # Hilo daemon: un apagado durante el precalentamiento no espera a que acabe.
+    threading.Thread(target=precalentamiento.precalentar, name="precalentamiento", daemon=True).start()
+    yield
+    auditoria.detener()
+
+
+app = FastAPI(title="Sistema de Autenticación", lifespan=lifespan)
+
+@app.exception_handler(CircuitoAbierto)
+async def circuito_abierto(request: Request, error: CircuitoAbierto):
+    return Response(
+        content=json.dumps({"detail": f"Servicio temporalmente no disponible ({error.nombre})"}),
+        media_type="application/json",
+        status_code=503,
+        headers={"Retry-After": str(max(math.ceil(error.reintentar_en), 1))}
+    )
 
 # 🚨 Asegúrate de incluir AMBOS (localhost y 127.0.0.1)
 origins = [
@@ -12,6 +46,9 @@ origins = [
     "http://127.0.0.1"
 ]
 
+# Reintentos con Idempotency-Key reciben la respuesta original (va dentro de CORS)
+app.add_middleware(MiddlewareIdempotencia)
+
 app.add_middleware(
     CORSMiddleware,
     allow_origins=origins,
@@ -20,11 +57,43 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Profiling bajo demanda (desactivado por defecto, ver app/profiling.py)
+app.add_middleware(MiddlewareProfiling)
+
 # Incluir routers
 app.include_router(auth.router, prefix="/api/auth", tags=["autenticacion"])
 app.include_router(verificacion.router, prefix="/api/verificacion", tags=["verificacion"])
 app.include_router(totp.router)  # ← El router ya tiene prefix="/api/totp"
+app.include_router(eventos.router)  # SSE: /api/eventos/{usuario_id}
+app.include_router(profiling_admin.router)
 
 @app.get("/")
 def read_root():
-    return {"message": "API de autenticación funcionando"}
\ No newline at end of file
+    return {"message": "API de autenticación funcionando"}
+
+@app.get("/estado/circuitos", include_in_schema=False)
+def circuitos():
+    """Estado de los circuit breakers (base de datos, SMTP, SMS)"""
+    return estado_circuitos()
+
+@app.get("/ready", include_in_schema=False)
+def readiness():
+    """503 hasta que termine el precalentamiento del arranque con la primaria disponible"""
+    precalentamiento.reintentar_primaria()
+    return Response(
+        content=json.dumps(precalentamiento.estado),
+        media_type="application/json",
+        status_code=200 if precalentamiento.estado["listo"] else 503
+    )
+
+
+# Claves públicas para que otros servicios verifiquen los JWT sin llamar a esta API
+_JWKS_BYTES = json.dumps(JWKS).encode()
+
+@app.get("/.well-known/jwks.json", include_in_schema=False)
+def jwks():
+    return Response(
+        content=_JWKS_BYTES,
+        media_type="application/json",
+        headers={"Cache-Control": "public, max-age=3600"}
+    )
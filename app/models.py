@@ -1,5 +1,6 @@
-from sqlalchemy import Column, Integer, String, DateTime, Boolean
+from sqlalchemy import Column, Integer, String, DateTime, Boolean, Index
 from datetime import datetime
+from typing import NamedTuple, Optional
 from .database import Base
 
 class Usuario(Base):
@@ -22,6 +23,23 @@ class Usuario(Base):
     
     fecha_creacion = Column(DateTime, default=datetime.utcnow)
 
+class DatosLogin(NamedTuple):
+    """Columnas de `usuarios` que necesita el login (sin las preguntas de seguridad)."""
+    id: int
+    usuario: str
+    nombre: str
+    apellidos: str
+    email: str
+    telefono: str
+    contrasena: str
+    email_verificado: Optional[bool]
+    telefono_verificado: Optional[bool]
+    totp_habilitado: Optional[bool]
+    secreto_totp: Optional[str]
+
+
+COLUMNAS_LOGIN = tuple(getattr(Usuario, campo) for campo in DatosLogin._fields)
+
 class CodigoVerificacion(Base):
     __tablename__ = "codigos_verificacion"
 
@@ -30,4 +48,18 @@ class CodigoVerificacion(Base):
     codigo = Column(String(10), nullable=False)
     tipo = Column(String(20), nullable=False)
     expira = Column(DateTime, nullable=False)
-    fecha_creacion = Column(DateTime, default=datetime.utcnow)
\ No newline at end of file
+    fecha_creacion = Column(DateTime, default=datetime.utcnow)
+
+class ActividadLogin(Base):
+    """Registro append-only de eventos de autenticación (lo escribe app.auditoria en lotes)."""
+    __tablename__ = "actividad_login"
+    # Sirve a /actividad/{usuario_id}: filtra por usuario y ordena por fecha
+    __table_args__ = (Index("ix_actividad_login_usuario_fecha", "usuario_id", "fecha"),)
+
+    id = Column(Integer, primary_key=True)
+    usuario_id = Column(Integer, nullable=True)
+    usuario = Column(String(50), nullable=True)
+    evento = Column(String(30), nullable=False)
+    exito = Column(Boolean, nullable=False)
+    detalle = Column(String(200), nullable=True)
+    fecha = Column(DateTime, nullable=False, default=datetime.utcnow)
@@ -0,0 +1,115 @@
+import os
+import threading
+import time
+from datetime import datetime
+from sqlalchemy.orm import Session
+from .database import engine, replicas
+from .models import Usuario, CodigoVerificacion, COLUMNAS_LOGIN
+
+# ==========================================
+# ⚙️ CONFIGURACIÓN
+# ==========================================
+# Conexiones a abrir por engine (primaria y cada réplica) antes de recibir tráfico;
+# se limita al pool_size del engine (las que sobran se cerrarían al devolverlas)
+WARMUP_CONEXIONES = int(os.getenv("WARMUP_CONEXIONES", "5"))
+# Segundos entre reintentos de la primaria desde /ready si falló al arrancar
+WARMUP_REINTENTO_SEGUNDOS = float(os.getenv("WARMUP_REINTENTO_SEGUNDOS", "5"))
+
+# terminado: ya corrió el precalentamiento; listo: además la primaria respondió
+estado = {"listo": False, "terminado": False, "duracion_ms": None, "errores": []}
+_ultimo_intento_primaria = 0.0
+_lock_reintento = threading.Lock()
+
+
+def _abrir_conexiones(eng, cantidad: int):
+    """Abre `cantidad` conexiones a la vez (como mucho pool_size) y las devuelve al pool."""
+    tamano_pool = getattr(eng.pool, "size", None)
+    if callable(tamano_pool):
+        cantidad = min(cantidad, tamano_pool())
+    conexiones = []
+    try:
+        for _ in range(cantidad):
+            conexiones.append(eng.connect())
+    finally:
+        for conexion in conexiones:
+            conexion.close()
+
+
+def _compilar_consultas(db):
+    """
+    Ejecuta una vez cada forma de consulta de las rutas (con valores que no
+    existen) para que SQLAlchemy la deje en su caché de sentencias compiladas.
+    """
+    db.query(Usuario).filter(Usuario.usuario == "").first()
+    db.query(Usuario).filter(Usuario.email == "").first()
+    db.query(Usuario).filter(Usuario.id == 0).first()
+    db.query(*COLUMNAS_LOGIN).filter(Usuario.usuario == "").first()
+    db.query(Usuario.email, Usuario.totp_habilitado).filter(Usuario.email == "").first()
+    db.query(CodigoVerificacion).filter(
+        CodigoVerificacion.usuario_id == 0,
+        CodigoVerificacion.codigo == "",
+        CodigoVerificacion.tipo == "",
+        CodigoVerificacion.expira > datetime.utcnow()
+    ).first()
+    db.query(CodigoVerificacion).filter(
+        CodigoVerificacion.usuario_id == 0,
+        CodigoVerificacion.tipo == "",
+        CodigoVerificacion.expira > datetime.utcnow()
+    ).order_by(CodigoVerificacion.fecha_creacion.desc()).all()
+
+
+def _paso(nombre: str, funcion, *args) -> bool:
+    try:
+        funcion(*args)
+        return True
+    except Exception as e:
+        estado["errores"].append(f"{nombre}: {e}")
+        print(f"⚠️ Precalentamiento ({nombre}) falló: {e}")
+        return False
+
+
+def _compilar_en(eng, nombre: str) -> bool:
+    # La caché de sentencias compiladas es por engine: una pasada en cada uno
+    with Session(bind=eng) as db:
+        return _paso(nombre, _compilar_consultas, db)
+
+
+def _precalentar_primaria() -> bool:
+    global _ultimo_intento_primaria
+    _ultimo_intento_primaria = time.monotonic()
+    return (_paso("pool primaria", _abrir_conexiones, engine, WARMUP_CONEXIONES)
+            and _compilar_en(engine, "consultas primaria"))
+
+
+def precalentar():
+    """
+    Se ejecuta en segundo plano al arrancar. /ready responde 200 cuando
+    termina y la primaria respondió; las réplicas con errores no lo impiden
+    (las lecturas pasan a la primaria).
+    """
+    inicio = time.perf_counter()
+
+    primaria_ok = _precalentar_primaria()
+    for replica in replicas:
+        if _paso(f"pool {replica['url']}", _abrir_conexiones, replica["engine"], WARMUP_CONEXIONES):
+            _compilar_en(replica["engine"], f"consultas {replica['url']}")
+
+    estado["duracion_ms"] = round((time.perf_counter() - inicio) * 1000, 1)
+    estado["terminado"] = True
+    estado["listo"] = primaria_ok
+    print(f"🔥 Precalentamiento terminado en {estado['duracion_ms']} ms (primaria {'ok' if primaria_ok else 'con errores'})")
+
+
+def reintentar_primaria():
+    """Desde /ready: si la primaria falló al arrancar, se vuelve a probar cada WARMUP_REINTENTO_SEGUNDOS."""
+    if estado["listo"] or not estado["terminado"]:
+        return
+    if time.monotonic() - _ultimo_intento_primaria < WARMUP_REINTENTO_SEGUNDOS:
+        return
+    if not _lock_reintento.acquire(blocking=False):
+        return  # otra sonda ya lo está intentando
+    try:
+        estado["errores"].clear()
+        estado["listo"] = _precalentar_primaria()
+    finally:
+        _lock_reintento.release()
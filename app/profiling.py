@@ -0,0 +1,244 @@
+import asyncio
+import contextvars
+import hmac
+import os
+import random
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter
+from datetime import datetime
+
+# ==========================================
+# ⚙️ CONFIGURACIÓN (desactivado por defecto)
+# ==========================================
+PROFILING_ADMIN_TOKEN = os.getenv("PROFILING_ADMIN_TOKEN", "")
+PROFILING_DIR = os.getenv("PROFILING_DIR", "perfiles")
+PROFILING_INTERVALO_MS = float(os.getenv("PROFILING_INTERVALO_MS", "5"))
+PROFILING_MAX_ARCHIVOS = int(os.getenv("PROFILING_MAX_ARCHIVOS", "50"))
+# Tope de muestreo por petición (peticiones largas dejan de muestrearse)
+PROFILING_MAX_SEGUNDOS = float(os.getenv("PROFILING_MAX_SEGUNDOS", "30"))
+HEADER_PROFILING = b"x-profile"
+
+# Modificable en caliente desde /admin/profiling/config
+config = {
+    "habilitado": os.getenv("PROFILING_HABILITADO", "false").lower() == "true",
+    "muestreo": float(os.getenv("PROFILING_MUESTREO", "0")),  # 0.0 – 1.0
+}
+
+# Solo se perfila una petición a la vez; las demás siguen sin perfilar
+_lock_perfil = threading.Lock()
+# Muestreador de la petición en curso; el threadpool copia el contexto a sus hilos
+_perfil_actual = contextvars.ContextVar("perfil_actual", default=None)
+
+
+# ==========================================
+# 🔥 MUESTREO DE PILAS (formato flamegraph)
+# ==========================================
+class MuestreadorPilas:
+    """
+    Toma una foto de la pila cada PROFILING_INTERVALO_MS y acumula las pilas
+    en formato "collapsed" (a;b;c N), que leen flamegraph.pl, speedscope e
+    inferno. Solo se muestrean los hilos de la petición: el del event loop
+    (rutas async y middlewares) y los del threadpool que ejecutan código
+    con el contexto de esta petición (rutas y dependencias síncronas).
+    """
+
+    def __init__(self, hilo_principal: int, intervalo_ms: float = PROFILING_INTERVALO_MS,
+                 max_segundos: float = PROFILING_MAX_SEGUNDOS):
+        self.hilo_principal = hilo_principal
+        self.intervalo = intervalo_ms / 1000
+        self.max_segundos = max_segundos
+        self.pilas = Counter()
+        self._parar = threading.Event()
+        self._hilo = threading.Thread(target=self._bucle, name="profiling-muestreo", daemon=True)
+
+    def _es_de_la_peticion(self, frame) -> bool:
+        # Los hilos del threadpool ejecutan `contexto.run(funcion)`: se busca
+        # en su pila un Context copiado de esta petición
+        while frame is not None:
+            for valor in list(frame.f_locals.values()):
+                if isinstance(valor, contextvars.Context) and valor.get(_perfil_actual) is self:
+                    return True
+            frame = frame.f_back
+        return False
+
+    def _bucle(self):
+        propio = threading.get_ident()
+        limite = time.monotonic() + self.max_segundos
+        while not self._parar.wait(self.intervalo) and time.monotonic() < limite:
+            nombres = {h.ident: h.name for h in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                if ident == propio:
+                    continue
+                if ident != self.hilo_principal and not self._es_de_la_peticion(frame):
+                    continue
+                pila = []
+                while frame is not None:
+                    codigo = frame.f_code
+                    archivo = os.path.basename(codigo.co_filename)
+                    pila.append(f"{codigo.co_name} ({archivo}:{codigo.co_firstlineno})")
+                    frame = frame.f_back
+                pila.append(nombres.get(ident, str(ident)))
+                self.pilas[";".join(reversed(pila))] += 1
+
+    def iniciar(self):
+        self._hilo.start()
+
+    def detener(self):
+        self._parar.set()
+        self._hilo.join()
+
+    def guardar(self, nombre: str) -> str:
+        os.makedirs(PROFILING_DIR, exist_ok=True)
+        ruta = os.path.join(PROFILING_DIR, nombre)
+        with open(ruta, "w", encoding="utf-8") as archivo:
+            for pila, cuenta in self.pilas.items():
+                archivo.write(f"{pila} {cuenta}\n")
+        _podar_archivos()
+        return ruta
+
+
+def _podar_archivos():
+    """Conserva solo los PROFILING_MAX_ARCHIVOS perfiles más recientes."""
+    archivos = sorted(
+        (os.path.join(PROFILING_DIR, f) for f in os.listdir(PROFILING_DIR) if f.endswith(".folded")),
+        key=os.path.getmtime
+    )
+    for ruta in archivos[:-PROFILING_MAX_ARCHIVOS]:
+        os.remove(ruta)
+
+
+def listar_perfiles() -> list:
+    if not os.path.isdir(PROFILING_DIR):
+        return []
+    return sorted(f for f in os.listdir(PROFILING_DIR) if f.endswith(".folded"))
+
+
+def token_valido(token) -> bool:
+    return bool(PROFILING_ADMIN_TOKEN) and token is not None and hmac.compare_digest(
+        token.encode() if isinstance(token, str) else token, PROFILING_ADMIN_TOKEN.encode()
+    )
+
+
+def _debe_perfilar(scope) -> bool:
+    # Header X-Profile con el token de administrador → perfilar siempre
+    for nombre, valor in scope.get("headers", ()):
+        if nombre == HEADER_PROFILING:
+            return token_valido(valor)
+    return config["muestreo"] > 0 and random.random() < config["muestreo"]
+
+
+def _es_stream(mensaje) -> bool:
+    for nombre, valor in mensaje.get("headers", ()):
+        if nombre.lower() == b"content-type":
+            return valor.startswith(b"text/event-stream")
+    return False
+
+
+class MiddlewareProfiling:
+    """
+    Middleware ASGI: si el profiling está desactivado solo comprueba un
+    booleano. Si está activo, perfila las peticiones con header X-Profile
+    válido o una fracción `muestreo` de ellas. Los streams SSE no se
+    perfilan: no terminan y retendrían el muestreador toda la conexión.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not config["habilitado"] or not _debe_perfilar(scope):
+            return await self.app(scope, receive, send)
+
+        if not _lock_perfil.acquire(blocking=False):
+            return await self.app(scope, receive, send)
+
+        muestreador = MuestreadorPilas(threading.get_ident())
+        token = _perfil_actual.set(muestreador)
+        inicio = time.perf_counter()
+        terminado = False
+
+        async def terminar(guardar: bool):
+            nonlocal terminado
+            if terminado:
+                return
+            terminado = True
+            try:
+                # join y escritura del archivo fuera del event loop
+                await asyncio.to_thread(_cerrar_perfil, muestreador, scope, inicio, guardar)
+            finally:
+                _lock_perfil.release()
+
+        async def send_vigilando(mensaje):
+            if mensaje["type"] == "http.response.start" and _es_stream(mensaje):
+                await terminar(guardar=False)
+            await send(mensaje)
+
+        muestreador.iniciar()
+        try:
+            await self.app(scope, receive, send_vigilando)
+        finally:
+            _perfil_actual.reset(token)
+            await terminar(guardar=True)
+
+
+def _cerrar_perfil(muestreador: MuestreadorPilas, scope, inicio: float, guardar: bool):
+    muestreador.detener()
+    if not guardar:
+        return
+    duracion_ms = (time.perf_counter() - inicio) * 1000
+    ruta = scope["path"].strip("/").replace("/", "_") or "raiz"
+    nombre = f"{datetime.utcnow():%Y%m%d_%H%M%S_%f}_{scope['method']}_{ruta}.folded"
+    archivo = muestreador.guardar(nombre)
+    print(f"🔥 Perfil {scope['method']} {scope['path']} ({duracion_ms:.1f} ms) → {archivo}")
+
+
+# ==========================================
+# 🧠 MEMORIA (tracemalloc)
+# ==========================================
+_ultimo_snapshot = None
+
+
+def iniciar_memoria(frames: int = 10):
+    global _ultimo_snapshot
+    if not tracemalloc.is_tracing():
+        tracemalloc.start(frames)
+    _ultimo_snapshot = None
+
+
+def detener_memoria():
+    global _ultimo_snapshot
+    tracemalloc.stop()
+    _ultimo_snapshot = None
+
+
+def snapshot_memoria(limite: int = 20) -> dict:
+    """Top de asignaciones actuales y diferencia contra el snapshot anterior."""
+    global _ultimo_snapshot
+    if not tracemalloc.is_tracing():
+        return {"activo": False}
+
+    snapshot = tracemalloc.take_snapshot().filter_traces((
+        tracemalloc.Filter(False, tracemalloc.__file__),
+        tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+    ))
+    actual, pico = tracemalloc.get_traced_memory()
+    resultado = {
+        "activo": True,
+        "memoria_actual_kb": round(actual / 1024, 1),
+        "memoria_pico_kb": round(pico / 1024, 1),
+        "top": [
+            {"lugar": str(s.traceback[0]), "kb": round(s.size / 1024, 1), "bloques": s.count}
+            for s in snapshot.statistics("lineno")[:limite]
+        ],
+        "diferencia": None,
+    }
+    if _ultimo_snapshot is not None:
+        resultado["diferencia"] = [
+            {"lugar": str(s.traceback[0]), "kb_diff": round(s.size_diff / 1024, 1), "bloques_diff": s.count_diff}
+            for s in snapshot.compare_to(_ultimo_snapshot, "lineno")[:limite]
+        ]
+    _ultimo_snapshot = snapshot
+    return resultado
@@ -0,0 +1,153 @@
+import os
+import random
+import threading
+import time
+
+# ==========================================
+# ⚙️ CONFIGURACIÓN
+# ==========================================
+CIRCUITO_UMBRAL_FALLOS = int(os.getenv("CIRCUITO_UMBRAL_FALLOS", "5"))
+CIRCUITO_SEGUNDOS_ABIERTO = float(os.getenv("CIRCUITO_SEGUNDOS_ABIERTO", "30"))
+
+
+class CircuitoAbierto(Exception):
+    """La dependencia está fallando; se rechaza la llamada sin intentarla."""
+
+    def __init__(self, nombre: str, reintentar_en: float = CIRCUITO_SEGUNDOS_ABIERTO):
+        super().__init__(f"Circuito '{nombre}' abierto")
+        self.nombre = nombre
+        self.reintentar_en = reintentar_en  # segundos hasta la próxima sonda
+
+
+class CircuitBreaker:
+    """
+    cerrado → abierto tras `umbral_fallos` fallos seguidos.
+    abierto → rechaza todo durante `segundos_abierto`.
+    semiabierto → deja pasar una sola llamada de prueba: si sale bien se
+    cierra, si falla vuelve a abrirse.
+    """
+
+    def __init__(self, nombre: str, timeout: float,
+                 umbral_fallos: int = CIRCUITO_UMBRAL_FALLOS,
+                 segundos_abierto: float = CIRCUITO_SEGUNDOS_ABIERTO):
+        self.nombre = nombre
+        self.timeout = timeout
+        self.umbral_fallos = umbral_fallos
+        self.segundos_abierto = segundos_abierto
+        self.estado = "cerrado"
+        self.fallos = 0
+        self.rechazadas = 0
+        self._abierto_desde = 0.0
+        self._sonda_desde = None
+        self._lock = threading.Lock()
+        circuitos[nombre] = self
+
+    def permitir(self) -> bool:
+        if self.estado == "cerrado":
+            return True  # camino rápido, sin lock
+        with self._lock:
+            if self.estado == "cerrado":
+                return True
+            ahora = time.monotonic()
+            if self.estado == "abierto" and ahora - self._abierto_desde >= self.segundos_abierto:
+                self.estado = "semiabierto"
+            if self.estado == "semiabierto":
+                # Una sonda a la vez; si se quedó colgada, se permite otra
+                if self._sonda_desde is None or ahora - self._sonda_desde >= self.segundos_abierto:
+                    self._sonda_desde = ahora
+                    return True
+            self.rechazadas += 1
+            return False
+
+    def verificar(self):
+        if not self.permitir():
+            raise CircuitoAbierto(self.nombre, self.segundos_para_sonda())
+
+    def segundos_para_sonda(self) -> float:
+        """Cuánto falta para que el circuito deje pasar una llamada de prueba."""
+        with self._lock:
+            ahora = time.monotonic()
+            if self.estado == "abierto":
+                return max(self._abierto_desde + self.segundos_abierto - ahora, 0.0)
+            if self.estado == "semiabierto" and self._sonda_desde is not None:
+                # Hay una sonda en curso; se libera otra si esta se queda colgada
+                return max(self._sonda_desde + self.segundos_abierto - ahora, 0.0)
+            return 0.0
+
+    def exito(self):
+        if self.estado == "cerrado" and self.fallos == 0:
+            return  # camino rápido, sin lock
+        with self._lock:
+            self.estado = "cerrado"
+            self.fallos = 0
+            self._sonda_desde = None
+
+    def fallo(self):
+        with self._lock:
+            self.fallos += 1
+            if self.estado == "semiabierto" or self.fallos >= self.umbral_fallos:
+                if self.estado != "abierto":
+                    print(f"⚠️ Circuito '{self.nombre}' abierto tras {self.fallos} fallos")
+                self.estado = "abierto"
+                self._abierto_desde = time.monotonic()
+                self._sonda_desde = None
+
+    def llamar(self, funcion, *args, **kwargs):
+        """Ejecuta `funcion` protegida por el circuito (y por la inyección de fallos si está activa)."""
+        self.verificar()
+        try:
+            _inyectar_fallos(self)
+            resultado = funcion(*args, **kwargs)
+        except Exception:
+            self.fallo()
+            raise
+        self.exito()
+        return resultado
+
+    def resumen(self) -> dict:
+        with self._lock:
+            return {
+                "estado": self.estado,
+                "fallos_seguidos": self.fallos,
+                "rechazadas": self.rechazadas,
+                "timeout_segundos": self.timeout,
+                "umbral_fallos": self.umbral_fallos,
+                "segundos_abierto": self.segundos_abierto,
+            }
+
+
+circuitos = {}
+
+
+def estado_circuitos() -> dict:
+    return {nombre: circuito.resumen() for nombre, circuito in circuitos.items()}
+
+
+# ==========================================
+# 🧪 INYECCIÓN DE FALLOS (solo pruebas/staging)
+# ==========================================
+# FALLAS_<NOMBRE>="latencia_ms=3000,error=0.3" agrega latencia y errores
+# aleatorios antes de llamar al proveedor real. La latencia respeta el
+# timeout del circuito igual que un socket: si lo supera, se espera el
+# timeout y se lanza TimeoutError.
+def _config_fallos(nombre: str) -> dict:
+    valor = os.getenv(f"FALLAS_{nombre.upper()}", "")
+    config = {}
+    for parte in valor.split(","):
+        if "=" in parte:
+            clave, numero = parte.split("=", 1)
+            config[clave.strip()] = float(numero)
+    return config
+
+
+def _inyectar_fallos(circuito: CircuitBreaker):
+    config = _config_fallos(circuito.nombre)
+    if not config:
+        return
+    latencia = config.get("latencia_ms", 0) / 1000
+    if latencia:
+        time.sleep(min(latencia, circuito.timeout))
+        if latencia > circuito.timeout:
+            raise TimeoutError(f"[inyectado] {circuito.nombre} superó {circuito.timeout}s")
+    if random.random() < config.get("error", 0):
+        raise ConnectionError(f"[inyectado] error en {circuito.nombre}")
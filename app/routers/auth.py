@@ -1,11 +1,14 @@
-from fastapi import APIRouter, HTTPException, Depends, status
+from fastapi import APIRouter, HTTPException, Depends, Header, status
+from fastapi.responses import JSONResponse
 from sqlalchemy.orm import Session
-from datetime import datetime, timedelta 
-from ..database import get_db
-from ..models import Usuario
-from ..schemas import UsuarioRegistro, UsuarioLogin, UsuarioRespuesta, Token, LoginConTOTP, LoginRespuesta
-from ..auth_utils import hash_contrasena, verificar_contrasena, crear_token, verificar_codigo_totp
-from ..models import CodigoVerificacion
+from datetime import datetime
+from typing import Optional
+from ..database import get_db_transaccional, transaccional, get_db_lectura
+from ..models import Usuario, DatosLogin, COLUMNAS_LOGIN
+from ..schemas import UsuarioRegistro, UsuarioLogin, UsuarioRespuesta, Token, LoginConTOTP, LoginRespuesta, IntrospeccionSolicitud
+from ..auth_utils import hash_contrasena, verificar_contrasena, crear_token, verificar_codigo_totp, verificar_token_cacheado, usuario_del_token
+from ..models import CodigoVerificacion, ActividadLogin
+from ..auditoria import auditoria
 
 router = APIRouter()
 
@@ -14,7 +17,8 @@ router = APIRouter()
 # 🔐 REGISTRO DE USUARIO
 # ==========================================
 @router.post("/registro", response_model=UsuarioRespuesta, status_code=status.HTTP_201_CREATED)
-def registrar_usuario(datos: UsuarioRegistro, db: Session = Depends(get_db)):
+@transaccional
+def registrar_usuario(datos: UsuarioRegistro, db: Session = Depends(get_db_transaccional)):
     """Registrar un nuevo usuario"""
 
     # Verificar si el usuario ya existe
@@ -36,8 +40,7 @@ def registrar_usuario(datos: UsuarioRegistro, db: Session = Depends(get_db)):
     )
 
     db.add(nuevo_usuario)
-    db.commit()
-    db.refresh(nuevo_usuario)
+    db.flush()  # Asigna el id; el commit lo hace la unidad de trabajo
 
     return nuevo_usuario
 
@@ -45,8 +48,24 @@ def registrar_usuario(datos: UsuarioRegistro, db: Session = Depends(get_db)):
 # ==========================================
 # 🔑 LOGIN CON AUTENTICACIÓN 2FA (TOTP)
 # ==========================================
+def _respuesta_login(mensaje: str, requiere_totp: bool = False, access_token: str = None, usuario: dict = None):
+    """
+    Serializa con la misma forma que LoginRespuesta pero sin validar con
+    pydantic: al devolver un Response, FastAPI no vuelve a validar contra
+    response_model (que se conserva para la documentación).
+    """
+    return JSONResponse({
+        "access_token": access_token,
+        "token_type": "bearer",
+        "usuario": usuario,
+        "requiere_totp": requiere_totp,
+        "mensaje": mensaje
+    })
+
+
 @router.post("/login", response_model=LoginRespuesta)
-def iniciar_sesion(datos: LoginConTOTP, db: Session = Depends(get_db)):
+@transaccional
+def iniciar_sesion(datos: LoginConTOTP, db: Session = Depends(get_db_transaccional)):
     """
     Iniciar sesión con soporte para autenticación de dos factores (TOTP).
 
@@ -57,16 +76,20 @@ def iniciar_sesion(datos: LoginConTOTP, db: Session = Depends(get_db)):
     4. Si todo OK → devolver token JWT
     """
 
-    # 1️⃣ Buscar usuario
-    usuario = db.query(Usuario).filter(Usuario.usuario == datos.usuario).first()
-    if not usuario:
+    # 1️⃣ Buscar usuario (solo las columnas del login, sin hidratar la entidad)
+    fila = db.query(*COLUMNAS_LOGIN).filter(Usuario.usuario == datos.usuario).first()
+    if not fila:
+        auditoria.registrar("login_fallido", False, usuario=datos.usuario, detalle="usuario inexistente")
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Usuario o contraseña incorrectos"
         )
 
+    usuario = DatosLogin._make(fila)
+
     # 2️⃣ Verificar contraseña
     if not verificar_contrasena(datos.contrasena, usuario.contrasena):
+        auditoria.registrar("login_fallido", False, usuario.id, usuario.usuario, "contraseña incorrecta")
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Usuario o contraseña incorrectos"
@@ -77,22 +100,21 @@ def iniciar_sesion(datos: LoginConTOTP, db: Session = Depends(get_db)):
     # 3️⃣ ✨ Si eligió EMAIL (email_verificado = True)
     if usuario.email_verificado:
         if not datos.codigo_totp:
-            from .verificacion import generar_codigo
+            from .verificacion import emitir_codigo
             from .email import enviar_codigo_email
             
-            codigo = generar_codigo()
-            enviar_codigo_email(usuario.email, codigo, usuario.nombre)
-            
-            nuevo_codigo = CodigoVerificacion(
-                usuario_id=usuario.id,
-                codigo=codigo,
-                tipo='email_login',
-                expira=datetime.utcnow() + timedelta(minutes=10)
-            )
-            db.add(nuevo_codigo)
-            db.commit()
+            # Reutiliza el código vigente si se pidió hace poco (doble clic / reintentos)
+            codigo, enviar = emitir_codigo(db, usuario.id, 'email_login')
+            if enviar and not enviar_codigo_email(usuario.email, codigo, usuario.nombre):
+                # Sin envío no se guarda el código: el reintento no queda bloqueado por el cooldown
+                auditoria.registrar("desafio_2fa", False, usuario.id, usuario.usuario, "email no enviado")
+                raise HTTPException(
+                    status_code=500,
+                    detail="Error al enviar el email. Verifica la configuración SMTP."
+                )
+            auditoria.registrar("desafio_2fa", True, usuario.id, usuario.usuario, "email")
             
-            return LoginRespuesta(
+            return _respuesta_login(
                 mensaje=f"Código enviado a {usuario.email}",
                 requiere_totp=True
             )
@@ -105,26 +127,29 @@ def iniciar_sesion(datos: LoginConTOTP, db: Session = Depends(get_db)):
         ).first()
         
         if not codigo_valido:
+            auditoria.registrar("codigo_verificado", False, usuario.id, usuario.usuario, "email_login")
             raise HTTPException(
                 status_code=status.HTTP_401_UNAUTHORIZED,
                 detail="Código inválido o expirado"
             )
         
         db.delete(codigo_valido)
-        db.commit()
+        auditoria.registrar("codigo_verificado", True, usuario.id, usuario.usuario, "email_login")
 
 
     # 3️⃣ Verificar si tiene TOTP habilitado
     if usuario.totp_habilitado:
         # Si no envió código TOTP → solicitarlo
         if not datos.codigo_totp:
-            return LoginRespuesta(
+            auditoria.registrar("desafio_2fa", True, usuario.id, usuario.usuario, "totp")
+            return _respuesta_login(
                 mensaje="Ingresa tu código de autenticación de dos factores",
                 requiere_totp=True
             )
 
         # Verificar el código TOTP
         if not verificar_codigo_totp(usuario.secreto_totp, datos.codigo_totp):
+            auditoria.registrar("codigo_verificado", False, usuario.id, usuario.usuario, "totp")
             raise HTTPException(
                 status_code=status.HTTP_401_UNAUTHORIZED,
                 detail="Código de autenticación inválido o expirado"
@@ -132,10 +157,10 @@ def iniciar_sesion(datos: LoginConTOTP, db: Session = Depends(get_db)):
 
     # 4️⃣ Si no tiene TOTP, o ya lo validó → generar token
     access_token = crear_token(data={"sub": usuario.usuario})
+    auditoria.registrar("login_exitoso", True, usuario.id, usuario.usuario)
 
-    return LoginRespuesta(
+    return _respuesta_login(
         access_token=access_token,
-        token_type="bearer",
         usuario={
             "id": usuario.id,
             "usuario": usuario.usuario,
@@ -156,6 +181,104 @@ def iniciar_sesion(datos: LoginConTOTP, db: Session = Depends(get_db)):
 # 👥 LISTAR USUARIOS (SOLO PRUEBA)
 # ==========================================
 @router.get("/usuarios", response_model=list[UsuarioRespuesta])
-def obtener_usuarios(db: Session = Depends(get_db)):
+def obtener_usuarios(db: Session = Depends(get_db_lectura)):
     """Obtener todos los usuarios (solo para pruebas)"""
     return db.query(Usuario).all()
+
+
+# ==========================================
+# 🕵️ ACTIVIDAD RECIENTE DE LOGIN
+# ==========================================
+def usuario_autenticado(authorization: Optional[str] = Header(None)) -> str:
+    """Nombre de usuario (`sub`) del header Authorization: Bearer <token>, o 401."""
+    esquema, _, token = (authorization or "").partition(" ")
+    usuario = usuario_del_token(token) if esquema.lower() == "bearer" else None
+    if usuario is None:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Token inválido o ausente",
+            headers={"WWW-Authenticate": "Bearer"}
+        )
+    return usuario
+
+
+@router.get("/actividad/{usuario_id}")
+def obtener_actividad(
+    usuario_id: int,
+    limite: int = 50,
+    usuario: str = Depends(usuario_autenticado),
+    db: Session = Depends(get_db_lectura)
+):
+    """Últimos eventos de autenticación del propio usuario (más recientes primero)"""
+    if db.query(Usuario.id).filter(Usuario.usuario == usuario).scalar() != usuario_id:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="No autorizado")
+
+    eventos = db.query(ActividadLogin).filter(
+        ActividadLogin.usuario_id == usuario_id
+    ).order_by(ActividadLogin.fecha.desc()).limit(min(max(limite, 1), 500)).all()
+
+    return [
+        {
+            "evento": e.evento,
+            "exito": e.exito,
+            "detalle": e.detalle,
+            "fecha": e.fecha
+        }
+        for e in eventos
+    ]
+
+
+@router.get("/actividad-estadisticas")
+def estadisticas_auditoria():
+    """Estado del buffer de auditoría (pendientes, escritos, descartados)"""
+    return auditoria.estadisticas()
+
+
+# ==========================================
+# 🛂 INTROSPECCIÓN DE TOKENS EN LOTE (API gateway)
+# ==========================================
+@router.post("/introspeccion")
+def introspeccion_tokens(datos: IntrospeccionSolicitud, db: Session = Depends(get_db_lectura)):
+    """
+    Valida varios tokens en una sola llamada.
+    Las firmas se verifican con caché y los usuarios se cargan con un único IN.
+    Los límites de cantidad y longitud de tokens los valida el esquema (422).
+    """
+    verificados = [verificar_token_cacheado(token) for token in datos.tokens]
+    nombres = {claims["sub"] for claims, _ in verificados if claims and claims.get("sub")}
+
+    usuarios = {}
+    if nombres:
+        filas = db.query(
+            Usuario.id,
+            Usuario.usuario,
+            Usuario.email_verificado,
+            Usuario.telefono_verificado,
+            Usuario.totp_habilitado
+        ).filter(Usuario.usuario.in_(nombres)).all()
+        usuarios = {fila.usuario: fila for fila in filas}
+
+    resultados = []
+    for claims, error in verificados:
+        if claims is None:
+            resultados.append({"active": False, "error": error})
+            continue
+
+        fila = usuarios.get(claims.get("sub"))
+        if fila is None:
+            resultados.append({"active": False, "error": "Usuario no encontrado"})
+            continue
+
+        resultados.append({
+            "active": True,
+            "claims": claims,
+            "usuario": {
+                "id": fila.id,
+                "usuario": fila.usuario,
+                "email_verificado": fila.email_verificado,
+                "telefono_verificado": fila.telefono_verificado,
+                "totp_habilitado": fila.totp_habilitado
+            }
+        })
+
+    return {"resultados": resultados}
@@ -2,12 +2,36 @@ import smtplib
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
 import os
+import time
+from ..resiliencia import CircuitBreaker, CircuitoAbierto
 
 # ⚙️ Configuración del servidor SMTP (Gmail)
 SMTP_SERVER = "smtp.gmail.com"
 SMTP_PORT = 587
 SMTP_EMAIL = os.getenv("SMTP_EMAIL", "tu_email@gmail.com")  # ← Cambiar por tu email
 SMTP_PASSWORD = os.getenv("SMTP_PASSWORD", "tu_app_password")  # ← Contraseña de aplicación de Gmail
+# Plazo total del envío (conexión + TLS + login + envío), no por operación
+SMTP_TIMEOUT_SEGUNDOS = float(os.getenv("SMTP_TIMEOUT_SEGUNDOS", "10"))
+
+circuito_smtp = CircuitBreaker("smtp", timeout=SMTP_TIMEOUT_SEGUNDOS)
+
+def _enviar_smtp(mensaje):
+    limite = time.monotonic() + circuito_smtp.timeout
+
+    def restante():
+        # Cada paso solo puede usar lo que queda del plazo total
+        segundos = limite - time.monotonic()
+        if segundos <= 0:
+            raise TimeoutError(f"SMTP superó {circuito_smtp.timeout}s")
+        return segundos
+
+    with smtplib.SMTP(SMTP_SERVER, SMTP_PORT, timeout=restante()) as servidor:
+        servidor.sock.settimeout(restante())
+        servidor.starttls()  # Habilitar seguridad TLS
+        servidor.sock.settimeout(restante())
+        servidor.login(SMTP_EMAIL, SMTP_PASSWORD)
+        servidor.sock.settimeout(restante())
+        servidor.send_message(mensaje)
 
 def enviar_codigo_email(destinatario: str, codigo: str, nombre_usuario: str):
     """
@@ -20,6 +44,9 @@ def enviar_codigo_email(destinatario: str, codigo: str, nombre_usuario: str):
     
     Returns:
         bool: True si se envió correctamente, False si hubo error
+
+    Raises:
+        CircuitoAbierto: si el SMTP está fallando y no se intentó el envío (→ 503)
     """
     try:
         # Crear mensaje
@@ -55,15 +82,15 @@ def enviar_codigo_email(destinatario: str, codigo: str, nombre_usuario: str):
         parte_html = MIMEText(html, "html")
         mensaje.attach(parte_html)
 
-        # Conectar y enviar email
-        with smtplib.SMTP(SMTP_SERVER, SMTP_PORT) as servidor:
-            servidor.starttls()  # Habilitar seguridad TLS
-            servidor.login(SMTP_EMAIL, SMTP_PASSWORD)
-            servidor.send_message(mensaje)
+        # Conectar y enviar email (falla al instante si el circuito SMTP está abierto)
+        circuito_smtp.llamar(_enviar_smtp, mensaje)
         
         print(f"✅ Email enviado exitosamente a {destinatario}")
         return True
 
+    except CircuitoAbierto:
+        print("❌ SMTP no disponible (circuito abierto), no se intentó el envío")
+        raise
     except smtplib.SMTPAuthenticationError:
         print("❌ Error de autenticación: Verifica tu email y contraseña de aplicación")
         return False
@@ -0,0 +1,115 @@
+import asyncio
+import json
+from typing import Optional
+from fastapi import APIRouter, Header, HTTPException, Query, status
+from fastapi.responses import StreamingResponse
+from fastapi.concurrency import run_in_threadpool
+from ..database import SessionLocal
+from ..models import Usuario
+from ..eventos import hub
+from ..auth_utils import usuario_del_token
+
+router = APIRouter(prefix="/api/eventos", tags=["eventos"])
+
+KEEPALIVE_SEGUNDOS = 15
+
+
+def _formato_sse(evento: str, datos: dict) -> str:
+    return f"event: {evento}\ndata: {json.dumps(datos)}\n\n"
+
+
+@router.get("/estadisticas")
+def estadisticas_eventos():
+    """Conexiones SSE abiertas en este worker"""
+    return hub.estadisticas()
+
+
+def _id_de_usuario(nombre: str):
+    db = SessionLocal()
+    try:
+        return db.query(Usuario.id).filter(Usuario.usuario == nombre).scalar()
+    finally:
+        db.close()
+
+
+def _estado_usuario(usuario_id: int):
+    # Primaria, no réplica: una réplica atrasada devolvería un estado ya superado
+    db = SessionLocal()
+    try:
+        return db.query(
+            Usuario.email_verificado,
+            Usuario.telefono_verificado,
+            Usuario.totp_habilitado
+        ).filter(Usuario.id == usuario_id).first()
+    finally:
+        db.close()
+
+
+@router.get("/{usuario_id}")
+async def eventos_usuario(
+    usuario_id: int,
+    token: Optional[str] = Query(None),
+    authorization: Optional[str] = Header(None)
+):
+    """
+    Canal SSE con los cambios de verificación del usuario
+    (email_verificado, telefono_verificado, totp_habilitado).
+    Reemplaza el polling a /api/totp/estado/{email}.
+
+    Solo el propio usuario: token en Authorization: Bearer o, como
+    EventSource no envía headers, en el parámetro ?token=.
+    """
+    esquema, _, token_header = (authorization or "").partition(" ")
+    nombre = usuario_del_token(token_header if esquema.lower() == "bearer" else token)
+    if nombre is None:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Token inválido o ausente",
+            headers={"WWW-Authenticate": "Bearer"}
+        )
+    # Las consultas son bloqueantes: en el threadpool para no frenar el event loop
+    if await run_in_threadpool(_id_de_usuario, nombre) != usuario_id:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="No autorizado")
+
+    if not hub.hay_cupo(usuario_id):
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="Demasiadas conexiones de eventos abiertas"
+        )
+
+    async def flujo():
+        # La suscripción vive dentro del generador: si el stream nunca llega
+        # a iterarse (cliente que se va antes) no queda nada registrado
+        suscripcion = hub.suscribir(usuario_id)
+        if suscripcion is None:
+            # Otro cliente ocupó el último cupo entre la comprobación y ahora
+            yield _formato_sse("error", {"detail": "Demasiadas conexiones de eventos abiertas"})
+            return
+        _, cola = suscripcion
+        try:
+            # Primero suscribirse y después leer: un cambio confirmado entre
+            # medias llega por la cola en lugar de perderse
+            usuario = await run_in_threadpool(_estado_usuario, usuario_id)
+            if not usuario:
+                yield _formato_sse("error", {"detail": "Usuario no encontrado"})
+                return
+            yield _formato_sse("estado", {
+                "email_verificado": usuario.email_verificado,
+                "telefono_verificado": usuario.telefono_verificado,
+                "totp_habilitado": usuario.totp_habilitado
+            })
+            while True:
+                try:
+                    cambios = await asyncio.wait_for(cola.get(), KEEPALIVE_SEGUNDOS)
+                except asyncio.TimeoutError:
+                    yield ": keepalive\n\n"
+                    continue
+                yield _formato_sse("cambio", cambios)
+        finally:
+            hub.cancelar(usuario_id, suscripcion)
+
+    return StreamingResponse(
+        flujo(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
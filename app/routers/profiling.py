@@ -0,0 +1,59 @@
+from fastapi import APIRouter, Depends, Header, HTTPException, status
+from pydantic import BaseModel
+from typing import Optional
+from .. import profiling
+
+router = APIRouter(prefix="/admin/profiling", tags=["profiling"])
+
+
+def verificar_admin(x_admin_token: Optional[str] = Header(None)):
+    """Sin PROFILING_ADMIN_TOKEN configurado, los endpoints quedan cerrados."""
+    if not profiling.token_valido(x_admin_token):
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="No autorizado")
+
+
+class ConfigProfiling(BaseModel):
+    habilitado: Optional[bool] = None
+    muestreo: Optional[float] = None
+
+
+@router.get("/estado", dependencies=[Depends(verificar_admin)])
+def estado_profiling():
+    """Configuración actual y perfiles generados"""
+    return {
+        **profiling.config,
+        "perfiles": profiling.listar_perfiles(),
+        "memoria_activa": profiling.tracemalloc.is_tracing()
+    }
+
+
+@router.post("/config", dependencies=[Depends(verificar_admin)])
+def configurar_profiling(datos: ConfigProfiling):
+    """Activa/desactiva el profiling o cambia la tasa de muestreo en caliente"""
+    if datos.muestreo is not None:
+        if not 0 <= datos.muestreo <= 1:
+            raise HTTPException(status_code=400, detail="El muestreo debe estar entre 0 y 1")
+        profiling.config["muestreo"] = datos.muestreo
+    if datos.habilitado is not None:
+        profiling.config["habilitado"] = datos.habilitado
+    return profiling.config
+
+
+@router.post("/memoria/iniciar", dependencies=[Depends(verificar_admin)])
+def iniciar_memoria(frames: int = 10):
+    """Empieza a trazar asignaciones con tracemalloc"""
+    profiling.iniciar_memoria(frames)
+    return {"memoria_activa": True}
+
+
+@router.get("/memoria/snapshot", dependencies=[Depends(verificar_admin)])
+def snapshot_memoria(limite: int = 20):
+    """Top de asignaciones y diferencia contra el snapshot anterior"""
+    return profiling.snapshot_memoria(limite)
+
+
+@router.post("/memoria/detener", dependencies=[Depends(verificar_admin)])
+def detener_memoria():
+    """Detiene tracemalloc y libera sus estructuras"""
+    profiling.detener_memoria()
+    return {"memoria_activa": False}
@@ -1,8 +1,10 @@
 from fastapi import APIRouter, Depends, HTTPException, status
 from sqlalchemy.orm import Session
 from pydantic import BaseModel
-from ..database import get_db
+from ..database import get_db_transaccional, transaccional, get_db_lectura
 from ..models import Usuario
+from ..auditoria import auditoria
+from ..eventos import publicar_al_confirmar
 from ..auth_utils import (
     generar_secreto_totp, 
     generar_qr_totp, 
@@ -25,9 +27,10 @@ class HabilitarTOTPResponse(BaseModel):
     mensaje: str
 
 @router.post("/habilitar", response_model=HabilitarTOTPResponse)
+@transaccional
 async def habilitar_totp(
     request: HabilitarTOTPRequest,
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_db_transaccional)
 ):
     """
     Genera un secreto TOTP y código QR para el usuario.
@@ -47,8 +50,9 @@ async def habilitar_totp(
     
     # Guardar secreto (pero no habilitar aún)
     usuario.secreto_totp = secreto
+    if usuario.totp_habilitado:
+        publicar_al_confirmar(db, usuario.id, totp_habilitado=False)
     usuario.totp_habilitado = False  # Se habilitará después de verificar
-    db.commit()
     
     # Generar QR
     qr_code = generar_qr_totp(usuario.email, secreto)
@@ -60,9 +64,10 @@ async def habilitar_totp(
     }
 
 @router.post("/verificar")
+@transaccional
 async def verificar_y_activar_totp(
     request: VerificarTOTPRequest,
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_db_transaccional)
 ):
     """
     Verifica el código TOTP y activa la autenticación de dos factores.
@@ -84,6 +89,7 @@ async def verificar_y_activar_totp(
     
     # Verificar código
     if not verificar_codigo_totp(usuario.secreto_totp, request.codigo):
+        auditoria.registrar("codigo_verificado", False, usuario.id, usuario.usuario, "totp_activacion")
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Código TOTP inválido"
@@ -91,7 +97,8 @@ async def verificar_y_activar_totp(
     
     # Activar TOTP
     usuario.totp_habilitado = True
-    db.commit()
+    publicar_al_confirmar(db, usuario.id, totp_habilitado=True)
+    auditoria.registrar("codigo_verificado", True, usuario.id, usuario.usuario, "totp_activacion")
     
     return {
         "mensaje": "Autenticación de dos factores activada exitosamente",
@@ -99,9 +106,10 @@ async def verificar_y_activar_totp(
     }
 
 @router.post("/deshabilitar")
+@transaccional
 async def deshabilitar_totp(
     request: VerificarTOTPRequest,
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_db_transaccional)
 ):
     """
     Desactiva TOTP después de verificar un código válido.
@@ -130,7 +138,7 @@ async def deshabilitar_totp(
     # Deshabilitar
     usuario.totp_habilitado = False
     usuario.secreto_totp = None
-    db.commit()
+    publicar_al_confirmar(db, usuario.id, totp_habilitado=False)
     
     return {
         "mensaje": "Autenticación de dos factores desactivada",
@@ -138,11 +146,11 @@ async def deshabilitar_totp(
     }
 
 @router.get("/estado/{email}")
-async def verificar_estado_totp(email: str, db: Session = Depends(get_db)):
+async def verificar_estado_totp(email: str, db: Session = Depends(get_db_lectura)):
     """
     Verifica si un usuario tiene TOTP habilitado.
     """
-    usuario = db.query(Usuario).filter(Usuario.email == email).first()
+    usuario = db.query(Usuario.email, Usuario.totp_habilitado).filter(Usuario.email == email).first()
     
     if not usuario:
         raise HTTPException(
@@ -2,12 +2,16 @@ from fastapi import APIRouter, HTTPException, Depends
 from sqlalchemy.orm import Session
 from pydantic import BaseModel
 from datetime import datetime, timedelta
+import os
 import random
 import string
+import threading
 import pyotp  # 👈 Import para Google Authenticator (TOTP)
-from ..database import get_db
+from ..database import get_db_transaccional, transaccional
 from ..models import Usuario, CodigoVerificacion
 from .email import enviar_codigo_email
+from ..auditoria import auditoria
+from ..eventos import publicar_al_confirmar
 
 router = APIRouter()
 
@@ -25,8 +29,70 @@ def generar_codigo(longitud=6):
     """Genera un código numérico aleatorio"""
     return ''.join(random.choices(string.digits, k=longitud))
 
+# ------------------------------------------------------
+# ♻️ EMISIÓN DE CÓDIGOS (sin duplicar envíos)
+# ------------------------------------------------------
+VIGENCIA_CODIGO_MINUTOS = 10
+REENVIO_COOLDOWN_SEGUNDOS = int(os.getenv("REENVIO_COOLDOWN_SEGUNDOS", "60"))
+MAX_CODIGOS_ACTIVOS = int(os.getenv("MAX_CODIGOS_ACTIVOS", "3"))
+
+envios_suprimidos = {}  # tipo -> envíos evitados por reutilizar un código
+_lock_envios = threading.Lock()
+
+def emitir_codigo(db: Session, usuario_id: int, tipo: str):
+    """
+    Devuelve (codigo, enviar).
+
+    Si hay un código vigente emitido hace menos de REENVIO_COOLDOWN_SEGUNDOS
+    se reutiliza y enviar=False (no se inserta ni se envía nada). Si no, se
+    crea uno nuevo y se eliminan los más antiguos para no superar
+    MAX_CODIGOS_ACTIVOS por usuario y tipo. El commit lo hace la unidad de trabajo.
+
+    La fila del usuario se bloquea hasta el commit (UPDLOCK en SQL Server):
+    dos peticiones simultáneas (doble clic) se serializan y la segunda ve
+    el código que insertó la primera en lugar de enviar otro.
+    """
+    db.query(Usuario).with_hint(Usuario, "WITH (UPDLOCK, ROWLOCK)", "mssql").filter(
+        Usuario.id == usuario_id
+    ).with_for_update().first()
+    ahora = datetime.utcnow()
+    vigentes = db.query(CodigoVerificacion).filter(
+        CodigoVerificacion.usuario_id == usuario_id,
+        CodigoVerificacion.tipo == tipo,
+        CodigoVerificacion.expira > ahora
+    ).order_by(CodigoVerificacion.fecha_creacion.desc()).all()
+
+    if vigentes and vigentes[0].fecha_creacion > ahora - timedelta(seconds=REENVIO_COOLDOWN_SEGUNDOS):
+        with _lock_envios:
+            envios_suprimidos[tipo] = envios_suprimidos.get(tipo, 0) + 1
+        return vigentes[0].codigo, False
+
+    for anterior in vigentes[max(MAX_CODIGOS_ACTIVOS - 1, 0):]:
+        db.delete(anterior)
+
+    codigo = generar_codigo()
+    db.add(CodigoVerificacion(
+        usuario_id=usuario_id,
+        codigo=codigo,
+        tipo=tipo,
+        expira=ahora + timedelta(minutes=VIGENCIA_CODIGO_MINUTOS)
+    ))
+    return codigo, True
+
+@router.get("/estadisticas-envios")
+def estadisticas_envios():
+    """Cuántos envíos se evitaron por reutilizar códigos vigentes"""
+    with _lock_envios:
+        suprimidos = dict(envios_suprimidos)
+    return {
+        "envios_suprimidos": suprimidos,
+        "total_suprimidos": sum(suprimidos.values()),
+        "cooldown_segundos": REENVIO_COOLDOWN_SEGUNDOS
+    }
+
 @router.post("/enviar-codigo-sms")
-def enviar_codigo_sms(datos: SolicitudCodigoSMS, db: Session = Depends(get_db)):
+@transaccional
+def enviar_codigo_sms(datos: SolicitudCodigoSMS, db: Session = Depends(get_db_transaccional)):
     """Genera código de verificación (MODO PRUEBA - SIN ENVÍO REAL)"""
     
     usuario = db.query(Usuario).filter(Usuario.id == datos.usuario_id).first()
@@ -36,36 +102,28 @@ def enviar_codigo_sms(datos: SolicitudCodigoSMS, db: Session = Depends(get_db)):
     if usuario.telefono_verificado:
         raise HTTPException(status_code=400, detail="El teléfono ya está verificado")
     
-    # Generar código
-    codigo = generar_codigo()
-    
-    # MODO PRUEBA: Solo imprimir en consola
-    print(f"\n{'='*50}")
-    print(f"📱 CÓDIGO DE VERIFICACIÓN SMS (MODO PRUEBA)")
-    print(f"Teléfono: {usuario.telefono}")
-    print(f"Código: {codigo}")
-    print(f"Expira en: 10 minutos")
-    print(f"{'='*50}\n")
+    # Generar código (o reutilizar el vigente)
+    codigo, enviar = emitir_codigo(db, usuario.id, 'telefono')
     
-    # Guardar código en BD
-    nuevo_codigo = CodigoVerificacion(
-        usuario_id=usuario.id,
-        codigo=codigo,
-        tipo='telefono',
-        expira=datetime.utcnow() + timedelta(minutes=10)
-    )
-    
-    db.add(nuevo_codigo)
-    db.commit()
+    if enviar:
+        # MODO PRUEBA: Solo imprimir en consola
+        print(f"\n{'='*50}")
+        print(f"📱 CÓDIGO DE VERIFICACIÓN SMS (MODO PRUEBA)")
+        print(f"Teléfono: {usuario.telefono}")
+        print(f"Código: {codigo}")
+        print(f"Expira en: 10 minutos")
+        print(f"{'='*50}\n")
     
     return {
         "mensaje": f"Código enviado al número {usuario.telefono}",
         "codigo_prueba": codigo,  # Enviar código en respuesta (SOLO MODO PRUEBA)
-        "modo_prueba": True
+        "modo_prueba": True,
+        "reenvio_suprimido": not enviar
     }
 
 @router.post("/verificar-codigo-sms")
-def verificar_codigo_sms(datos: VerificarCodigoSMS, db: Session = Depends(get_db)):
+@transaccional
+def verificar_codigo_sms(datos: VerificarCodigoSMS, db: Session = Depends(get_db_transaccional)):
     """Verifica el código SMS ingresado"""
     
     usuario = db.query(Usuario).filter(Usuario.id == datos.usuario_id).first()
@@ -81,15 +139,16 @@ def verificar_codigo_sms(datos: VerificarCodigoSMS, db: Session = Depends(get_db
     ).first()
     
     if not codigo_valido:
+        auditoria.registrar("codigo_verificado", False, usuario.id, usuario.usuario, "telefono")
         raise HTTPException(status_code=400, detail="Código inválido o expirado")
     
     # Marcar teléfono como verificado
     usuario.telefono_verificado = True
-    db.commit()
+    publicar_al_confirmar(db, usuario.id, telefono_verificado=True)
     
     # Eliminar código usado
     db.delete(codigo_valido)
-    db.commit()
+    auditoria.registrar("codigo_verificado", True, usuario.id, usuario.usuario, "telefono")
     
     return {
         "mensaje": "Teléfono verificado exitosamente",
@@ -108,7 +167,8 @@ class VerificarTOTPRequest(BaseModel):
     codigo: str
 
 @router.post("/generar-totp")
-def generar_totp(datos: GenerarTOTPRequest, db: Session = Depends(get_db)):
+@transaccional
+def generar_totp(datos: GenerarTOTPRequest, db: Session = Depends(get_db_transaccional)):
     """Genera un código QR para configurar Google Authenticator"""
     usuario = db.query(Usuario).filter(Usuario.id == datos.usuario_id).first()
     if not usuario:
@@ -117,8 +177,6 @@ def generar_totp(datos: GenerarTOTPRequest, db: Session = Depends(get_db)):
     # Si el usuario no tiene secreto, se genera uno nuevo
     if not usuario.secreto_totp:
         usuario.secreto_totp = pyotp.random_base32()
-        db.commit()
-        db.refresh(usuario)
 
     # Generar URI para Google Authenticator
     totp = pyotp.TOTP(usuario.secreto_totp)
@@ -137,7 +195,8 @@ def generar_totp(datos: GenerarTOTPRequest, db: Session = Depends(get_db)):
 
 
 @router.post("/verificar-totp")
-def verificar_totp(datos: VerificarTOTPRequest, db: Session = Depends(get_db)):
+@transaccional
+def verificar_totp(datos: VerificarTOTPRequest, db: Session = Depends(get_db_transaccional)):
     """Verifica el código TOTP ingresado"""
     usuario = db.query(Usuario).filter(Usuario.id == datos.usuario_id).first()
     if not usuario or not usuario.secreto_totp:
@@ -145,11 +204,13 @@ def verificar_totp(datos: VerificarTOTPRequest, db: Session = Depends(get_db)):
 
     totp = pyotp.TOTP(usuario.secreto_totp)
     if not totp.verify(datos.codigo):
+        auditoria.registrar("codigo_verificado", False, usuario.id, usuario.usuario, "totp")
         raise HTTPException(status_code=400, detail="Código TOTP incorrecto o expirado")
 
     # Marcar TOTP como habilitado
     usuario.totp_habilitado = True
-    db.commit()
+    publicar_al_confirmar(db, usuario.id, totp_habilitado=True)
+    auditoria.registrar("codigo_verificado", True, usuario.id, usuario.usuario, "totp")
 
     return {
         "mensaje": "TOTP verificado correctamente",
@@ -167,7 +228,8 @@ class VerificarCodigoEmail(BaseModel):
     codigo: str
 
 @router.post("/enviar-codigo-email")
-def enviar_codigo_gmail(datos: SolicitudCodigoEmail, db: Session = Depends(get_db)):
+@transaccional
+def enviar_codigo_gmail(datos: SolicitudCodigoEmail, db: Session = Depends(get_db_transaccional)):
     """Genera y envía código de verificación por email"""
     
     usuario = db.query(Usuario).filter(Usuario.id == datos.usuario_id).first()
@@ -177,8 +239,15 @@ def enviar_codigo_gmail(datos: SolicitudCodigoEmail, db: Session = Depends(get_d
     if usuario.email_verificado:
         raise HTTPException(status_code=400, detail="El email ya está verificado")
     
-    # Generar código de 6 dígitos
-    codigo = generar_codigo()
+    # Generar código de 6 dígitos (o reutilizar el vigente)
+    codigo, enviar = emitir_codigo(db, usuario.id, 'email')
+    
+    if not enviar:
+        return {
+            "mensaje": f"Código enviado a {usuario.email}",
+            "email_enviado": True,
+            "reenvio_suprimido": True
+        }
     
     # Enviar email
     email_enviado = enviar_codigo_email(
@@ -193,17 +262,6 @@ def enviar_codigo_gmail(datos: SolicitudCodigoEmail, db: Session = Depends(get_d
             detail="Error al enviar el email. Verifica la configuración SMTP."
         )
     
-    # Guardar código en BD
-    nuevo_codigo = CodigoVerificacion(
-        usuario_id=usuario.id,
-        codigo=codigo,
-        tipo='email',
-        expira=datetime.utcnow() + timedelta(minutes=10)
-    )
-    
-    db.add(nuevo_codigo)
-    db.commit()
-    
     print(f"\n{'='*50}")
     print(f"📧 CÓDIGO ENVIADO POR EMAIL")
     print(f"Destinatario: {usuario.email}")
@@ -213,11 +271,13 @@ def enviar_codigo_gmail(datos: SolicitudCodigoEmail, db: Session = Depends(get_d
     
     return {
         "mensaje": f"Código enviado a {usuario.email}",
-        "email_enviado": True
+        "email_enviado": True,
+        "reenvio_suprimido": False
     }
 
 @router.post("/verificar-codigo-email")
-def verificar_codigo_gmail(datos: VerificarCodigoEmail, db: Session = Depends(get_db)):
+@transaccional
+def verificar_codigo_gmail(datos: VerificarCodigoEmail, db: Session = Depends(get_db_transaccional)):
     """Verifica el código de email ingresado"""
     
     usuario = db.query(Usuario).filter(Usuario.id == datos.usuario_id).first()
@@ -233,15 +293,16 @@ def verificar_codigo_gmail(datos: VerificarCodigoEmail, db: Session = Depends(ge
     ).first()
     
     if not codigo_valido:
+        auditoria.registrar("codigo_verificado", False, usuario.id, usuario.usuario, "email")
         raise HTTPException(status_code=400, detail="Código inválido o expirado")
     
     # Marcar email como verificado
     usuario.email_verificado = True
-    db.commit()
+    publicar_al_confirmar(db, usuario.id, email_verificado=True)
     
     # Eliminar código usado
     db.delete(codigo_valido)
-    db.commit()
+    auditoria.registrar("codigo_verificado", True, usuario.id, usuario.usuario, "email")
     
     return {
         "mensaje": "Email verificado exitosamente",
@@ -1,5 +1,5 @@
-from pydantic import BaseModel, EmailStr
-from typing import Optional
+from pydantic import BaseModel, EmailStr, Field
+from typing import Optional, List, Annotated
 
 from datetime import datetime
 
@@ -45,4 +45,11 @@ class LoginRespuesta(BaseModel):
     token_type: str = "bearer"
     usuario: Optional[dict] = None
     requiere_totp: bool = False  # ← Indica si necesita código
-    mensaje: str
\ No newline at end of file
+    mensaje: str
+
+# Máximo de tokens por llamada de introspección (SQL Server admite 2100 parámetros en el IN)
+MAX_TOKENS_INTROSPECCION = 500
+MAX_LONGITUD_TOKEN = 4096
+
+class IntrospeccionSolicitud(BaseModel):
+    tokens: List[Annotated[str, Field(max_length=MAX_LONGITUD_TOKEN)]] = Field(max_length=MAX_TOKENS_INTROSPECCION)
@@ -1,15 +1,25 @@
 from twilio.rest import Client
+from twilio.http.http_client import TwilioHttpClient
 import os
 from dotenv import load_dotenv
+from .resiliencia import CircuitBreaker, CircuitoAbierto
 
 load_dotenv()
 
+SMS_TIMEOUT_SEGUNDOS = float(os.getenv("SMS_TIMEOUT_SEGUNDOS", "10"))
+
+circuito_sms = CircuitBreaker("sms", timeout=SMS_TIMEOUT_SEGUNDOS)
+
 class TwilioService:
     def __init__(self):
         self.account_sid = os.getenv("TWILIO_ACCOUNT_SID")
         self.auth_token = os.getenv("TWILIO_AUTH_TOKEN")
         self.phone_number = os.getenv("TWILIO_PHONE_NUMBER")
-        self.client = Client(self.account_sid, self.auth_token)
+        self.client = Client(
+            self.account_sid,
+            self.auth_token,
+            http_client=TwilioHttpClient(timeout=SMS_TIMEOUT_SEGUNDOS)
+        )
     
     def enviar_sms(self, telefono_destino: str, mensaje: str):
         """Envía un SMS usando Twilio"""
@@ -18,7 +28,8 @@ class TwilioService:
             if not telefono_destino.startswith('+'):
                 telefono_destino = f'+52{telefono_destino}'  # +52 para México
             
-            message = self.client.messages.create(
+            message = circuito_sms.llamar(
+                self.client.messages.create,
                 body=mensaje,
                 from_=self.phone_number,
                 to=telefono_destino
@@ -29,6 +40,8 @@ class TwilioService:
                 "sid": message.sid,
                 "status": message.status
             }
+        except CircuitoAbierto:
+            raise  # lo responde el handler global con 503 + Retry-After
         except Exception as e:
             print(f"Error enviando SMS: {e}")
             return {
@@ -0,0 +1,95 @@
+"""
+Latencia y memoria asignada por login (handler iniciar_sesion, sin HTTP).
+
+Usa una base SQLite temporal con un usuario sin 2FA y mide:
+  - µs por llamada al handler y pico de memoria de una llamada (tracemalloc)
+  - la consulta del login con proyección (COLUMNAS_LOGIN) frente a
+    hidratar la entidad Usuario completa
+
+    python benchmarks/login_asignaciones.py --iteraciones 3000
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(tempfile.mkdtemp(prefix='bench_login_'), 'bench.db')}"
+os.environ["DATABASE_REPLICA_URLS"] = ""
+os.environ.setdefault("JWT_CLAVE_TEMPORAL", "true")
+
+from app.auditoria import auditoria  # noqa: E402
+from app.database import Base, SessionLocal, engine  # noqa: E402
+from app.models import COLUMNAS_LOGIN, Usuario  # noqa: E402
+from app.routers.auth import iniciar_sesion  # noqa: E402
+from app.schemas import LoginConTOTP  # noqa: E402
+
+engine.echo = False
+# Sin hilo de auditoría: solo interesa el costo del handler
+auditoria.registrar = lambda *args, **kwargs: None
+
+DATOS = LoginConTOTP(usuario="bench", contrasena="bench")
+
+
+def login():
+    db = SessionLocal()
+    try:
+        return iniciar_sesion(DATOS, db=db).body
+    finally:
+        db.close()
+
+
+def consulta_proyeccion():
+    with SessionLocal() as db:
+        return db.query(*COLUMNAS_LOGIN).filter(Usuario.usuario == "bench").first()
+
+
+def consulta_entidad():
+    with SessionLocal() as db:
+        return db.query(Usuario).filter(Usuario.usuario == "bench").first()
+
+
+def medir(funcion, iteraciones: int):
+    for _ in range(min(300, iteraciones)):
+        funcion()
+    inicio = time.perf_counter()
+    for _ in range(iteraciones):
+        funcion()
+    microsegundos = (time.perf_counter() - inicio) / iteraciones * 1e6
+
+    tracemalloc.start()
+    for _ in range(50):
+        funcion()
+    tracemalloc.reset_peak()
+    base = tracemalloc.get_traced_memory()[0]
+    funcion()
+    pico = tracemalloc.get_traced_memory()[1] - base
+    tracemalloc.stop()
+    return microsegundos, pico / 1024
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--iteraciones", type=int, default=3000)
+    args = parser.parse_args()
+
+    Base.metadata.create_all(engine)
+    with SessionLocal() as db:
+        db.add(Usuario(usuario="bench", nombre="Bench", apellidos="Login", email="bench@ejemplo.com",
+                       telefono="+520000000000", contrasena="bench"))
+        db.commit()
+
+    for nombre, funcion in (
+        ("handler login", login),
+        ("consulta proyección", consulta_proyeccion),
+        ("consulta entidad", consulta_entidad),
+    ):
+        microsegundos, pico_kb = medir(funcion, args.iteraciones)
+        print(f"{nombre:<20} {microsegundos:8.0f} µs/llamada   pico {pico_kb:6.1f} KB/llamada")
+
+
+if __name__ == "__main__":
+    main()
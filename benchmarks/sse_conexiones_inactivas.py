@@ -0,0 +1,113 @@
+"""
+Memoria del servidor con N conexiones SSE inactivas abiertas.
+
+Levanta uvicorn en un subproceso con una base SQLite temporal, registra un
+usuario, inicia sesión, abre N streams a /api/eventos/{id} que solo reciben el estado
+inicial y mide el RSS del proceso servidor antes y después (Linux, /proc).
+
+    python benchmarks/sse_conexiones_inactivas.py --conexiones 500
+"""
+import argparse
+import asyncio
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+import httpx
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def rss_kb(pid: int) -> int:
+    with open(f"/proc/{pid}/status") as archivo:
+        return int(archivo.read().split("VmRSS:")[1].split()[0])
+
+
+def levantar_servidor(puerto: int, conexiones: int) -> subprocess.Popen:
+    directorio = tempfile.mkdtemp(prefix="bench_sse_")
+    entorno = dict(
+        os.environ,
+        DATABASE_URL=f"sqlite:///{os.path.join(directorio, 'bench.db')}",
+        DATABASE_REPLICA_URLS="",
+        JWT_CLAVE_TEMPORAL="true",
+        SSE_MAX_CONEXIONES=str(conexiones + 10),
+        SSE_MAX_POR_USUARIO=str(conexiones + 10),
+    )
+    # Crear las tablas antes de arrancar (la API no ejecuta DDL)
+    subprocess.run(
+        [sys.executable, "-c", "from app.database import Base, engine; from app import models; Base.metadata.create_all(engine)"],
+        cwd=RAIZ, env=entorno, check=True, capture_output=True,
+    )
+    servidor = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(puerto), "--log-level", "warning"],
+        cwd=RAIZ, env=entorno, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    base = f"http://127.0.0.1:{puerto}"
+    for _ in range(100):
+        try:
+            if httpx.get(f"{base}/ready").status_code == 200:
+                return servidor
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.1)
+    servidor.terminate()
+    raise RuntimeError("El servidor no arrancó")
+
+
+async def abrir_streams(base: str, usuario_id: int, token: str, cantidad: int, espera: float):
+    limites = httpx.Limits(max_connections=cantidad + 10)
+    async with httpx.AsyncClient(limits=limites, timeout=30) as cliente:
+        abiertos = asyncio.Event()
+        listos = 0
+
+        async def stream():
+            nonlocal listos
+            async with cliente.stream("GET", f"{base}/api/eventos/{usuario_id}", params={"token": token}) as respuesta:
+                async for _ in respuesta.aiter_lines():
+                    listos += 1
+                    if listos == cantidad:
+                        abiertos.set()
+                    await asyncio.sleep(3600)
+
+        tareas = [asyncio.create_task(stream()) for _ in range(cantidad)]
+        await asyncio.wait_for(abiertos.wait(), 60)
+        await asyncio.sleep(espera)
+        estadisticas = (await cliente.get(f"{base}/api/eventos/estadisticas")).json()
+        conexiones = estadisticas["conexiones"]
+        for tarea in tareas:
+            tarea.cancel()
+        await asyncio.gather(*tareas, return_exceptions=True)
+        return conexiones
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--conexiones", type=int, default=500)
+    parser.add_argument("--puerto", type=int, default=8766)
+    parser.add_argument("--espera", type=float, default=2.0, help="segundos con los streams abiertos antes de medir")
+    args = parser.parse_args()
+
+    servidor = levantar_servidor(args.puerto, args.conexiones)
+    base = f"http://127.0.0.1:{args.puerto}"
+    try:
+        usuario = httpx.post(f"{base}/api/auth/registro", json={
+            "usuario": "bench", "nombre": "Bench", "apellidos": "SSE", "email": "bench@ejemplo.com",
+            "telefono": "+520000000000", "contrasena": "bench",
+        }).json()
+        token = httpx.post(f"{base}/api/auth/login", json={"usuario": "bench", "contrasena": "bench"}).json()["access_token"]
+        antes = rss_kb(servidor.pid)
+        conexiones = asyncio.run(abrir_streams(base, usuario["id"], token, args.conexiones, args.espera))
+        despues = rss_kb(servidor.pid)
+    finally:
+        servidor.terminate()
+        servidor.wait()
+
+    print(f"conexiones abiertas: {conexiones}")
+    print(f"RSS servidor: {antes} KB → {despues} KB (+{despues - antes} KB)")
+    print(f"por conexión: {(despues - antes) / max(conexiones, 1):.1f} KB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,19 @@
+-- Tabla de auditoría de login (app/auditoria.py, modelo ActividadLogin).
+-- Ejecutar una vez en SQL Server antes de desplegar; la API no crea tablas al arrancar.
+IF OBJECT_ID(N'dbo.actividad_login', N'U') IS NULL
+BEGIN
+    CREATE TABLE dbo.actividad_login (
+        id INTEGER NOT NULL IDENTITY,
+        usuario_id INTEGER NULL,
+        usuario VARCHAR(50) NULL,
+        evento VARCHAR(30) NOT NULL,
+        exito BIT NOT NULL,
+        detalle VARCHAR(200) NULL,
+        fecha DATETIME NOT NULL,
+        PRIMARY KEY (id)
+    );
+
+    -- Últimos eventos de un usuario (/api/auth/actividad/{usuario_id})
+    CREATE INDEX ix_actividad_login_usuario_fecha ON dbo.actividad_login (usuario_id, fecha);
+END
+GO
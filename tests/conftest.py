@@ -0,0 +1,54 @@
+import os
+import tempfile
+
+# La configuración se lee al importar app.*: primaria y réplica en dos SQLite temporales
+_DIRECTORIO = tempfile.mkdtemp(prefix="pruebas_auth_")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_DIRECTORIO, 'primaria.db')}"
+os.environ["DATABASE_REPLICA_URLS"] = f"sqlite:///{os.path.join(_DIRECTORIO, 'replica.db')}"
+os.environ["JWT_CLAVE_TEMPORAL"] = "true"
+
+import pytest
+
+from app.database import Base, engine, replicas
+from app import models  # noqa: F401  (registra las tablas en Base.metadata)
+
+
+@pytest.fixture(autouse=True)
+def bases_limpias():
+    """Primaria y réplica vacías en cada prueba."""
+    for destino in [engine] + [r["engine"] for r in replicas]:
+        Base.metadata.drop_all(destino)
+        Base.metadata.create_all(destino)
+    for replica in replicas:
+        replica["caida_hasta"] = 0.0
+    yield
+
+
+@pytest.fixture
+def cliente():
+    from fastapi.testclient import TestClient
+    from app.main import app
+
+    with TestClient(app) as cliente:
+        yield cliente
+
+
+@pytest.fixture
+def usuario_registrado(cliente):
+    respuesta = cliente.post("/api/auth/registro", json={
+        "usuario": "ana",
+        "nombre": "Ana",
+        "apellidos": "López",
+        "email": "ana@ejemplo.com",
+        "telefono": "+521234567890",
+        "contrasena": "secreta123",
+    })
+    assert respuesta.status_code == 201, respuesta.text
+    return respuesta.json()
+
+
+@pytest.fixture
+def sin_replicas():
+    """Saca las réplicas de rotación: las lecturas ven lo escrito en la primaria."""
+    for replica in replicas:
+        replica["caida_hasta"] = float("inf")
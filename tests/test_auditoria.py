@@ -0,0 +1,45 @@
+from app.auditoria import AuditoriaLogin
+from app.database import SessionLocal, engine
+from app.models import ActividadLogin
+
+
+def test_vaciar_escribe_los_eventos_en_lote():
+    auditoria = AuditoriaLogin()
+    for i in range(5):
+        auditoria.registrar("login_fallido", False, usuario=f"usuario{i}")
+    auditoria.vaciar()
+
+    with SessionLocal() as db:
+        assert db.query(ActividadLogin).count() == 5
+    assert auditoria.estadisticas()["escritos"] == 5
+
+
+def test_sin_tabla_se_cuentan_errores_sin_lanzar():
+    ActividadLogin.__table__.drop(engine)
+    auditoria = AuditoriaLogin()
+    auditoria.iniciar()  # no crea la tabla ni toca la base
+    auditoria.registrar("login_exitoso", True, usuario="ana")
+    auditoria.detener()
+
+    estadisticas = auditoria.estadisticas()
+    assert estadisticas["errores"] == 1
+    assert estadisticas["descartados"] == 1
+
+
+def test_actividad_solo_para_el_propio_usuario(cliente, usuario_registrado, sin_replicas):
+    from app.auth_utils import crear_token
+
+    auditoria = AuditoriaLogin()
+    auditoria.registrar("login_fallido", False, usuario_registrado["id"], "ana", "contraseña incorrecta")
+    auditoria.vaciar()
+    ruta = f"/api/auth/actividad/{usuario_registrado['id']}"
+
+    assert cliente.get(ruta).status_code == 401
+    assert cliente.get(ruta, headers={"Authorization": "Bearer basura"}).status_code == 401
+
+    ajeno = {"Authorization": f"Bearer {crear_token({'sub': 'otro'})}"}
+    assert cliente.get(ruta, headers=ajeno).status_code == 403
+
+    propio = cliente.get(ruta, headers={"Authorization": f"Bearer {crear_token({'sub': 'ana'})}"})
+    assert propio.status_code == 200
+    assert [e["detalle"] for e in propio.json()] == ["contraseña incorrecta"]
@@ -0,0 +1,46 @@
+import pytest
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import ec
+
+from app import auth_utils
+
+
+def _guardar_clave(directorio, kid):
+    privada = ec.generate_private_key(ec.SECP256R1())
+    (directorio / f"{kid}.pem").write_bytes(privada.private_bytes(
+        serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8, serialization.NoEncryption()
+    ))
+
+
+def test_sin_claves_no_arranca_sin_permiso_explicito(monkeypatch, tmp_path):
+    monkeypatch.setattr(auth_utils, "JWT_KEYS_DIR", str(tmp_path))
+    monkeypatch.setattr(auth_utils, "JWT_CLAVE_TEMPORAL", False)
+    with pytest.raises(RuntimeError):
+        auth_utils._cargar_claves()
+
+    monkeypatch.setattr(auth_utils, "JWT_CLAVE_TEMPORAL", True)
+    (kid,) = auth_utils._cargar_claves()
+    assert kid.startswith("temporal-")
+
+
+def test_varias_claves_exigen_jwt_active_kid(monkeypatch, tmp_path):
+    _guardar_clave(tmp_path, "2026-09")
+    _guardar_clave(tmp_path, "2026-10")
+    monkeypatch.setattr(auth_utils, "JWT_KEYS_DIR", str(tmp_path))
+    claves = auth_utils._cargar_claves()
+
+    monkeypatch.setattr(auth_utils, "JWT_ACTIVE_KID", "")
+    with pytest.raises(RuntimeError):
+        auth_utils._elegir_kid_activo(claves)
+
+    monkeypatch.setattr(auth_utils, "JWT_ACTIVE_KID", "2026-09")
+    assert auth_utils._elegir_kid_activo(claves) == "2026-09"
+
+    monkeypatch.setattr(auth_utils, "JWT_ACTIVE_KID", "2025-01")
+    with pytest.raises(RuntimeError):
+        auth_utils._elegir_kid_activo(claves)
+
+
+def test_token_firmado_se_verifica_con_su_kid():
+    token = auth_utils.crear_token({"sub": "ana"})
+    assert auth_utils.verificar_token(token)["sub"] == "ana"
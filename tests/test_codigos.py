@@ -0,0 +1,67 @@
+from app.database import SessionLocal
+from app.models import CodigoVerificacion, Usuario
+from app.routers import email
+
+
+def _email_verificado(usuario_id):
+    with SessionLocal() as db:
+        db.query(Usuario).filter(Usuario.id == usuario_id).update({"email_verificado": True})
+        db.commit()
+
+
+def _codigos(tipo):
+    with SessionLocal() as db:
+        return db.query(CodigoVerificacion).filter(CodigoVerificacion.tipo == tipo).count()
+
+
+def _login(cliente):
+    return cliente.post("/api/auth/login", json={"usuario": "ana", "contrasena": "secreta123"})
+
+
+def test_reenvio_dentro_del_cooldown_reutiliza_el_codigo(cliente, usuario_registrado):
+    primera = cliente.post("/api/verificacion/enviar-codigo-sms", json={"usuario_id": usuario_registrado["id"]})
+    segunda = cliente.post("/api/verificacion/enviar-codigo-sms", json={"usuario_id": usuario_registrado["id"]})
+
+    assert segunda.json()["reenvio_suprimido"] is True
+    assert segunda.json()["codigo_prueba"] == primera.json()["codigo_prueba"]
+    assert _codigos("telefono") == 1
+
+
+def test_login_sin_envio_de_email_no_guarda_codigo(cliente, usuario_registrado, monkeypatch):
+    _email_verificado(usuario_registrado["id"])
+    envios = []
+    monkeypatch.setattr(email, "enviar_codigo_email", lambda *args: envios.append(args) and False)
+
+    assert _login(cliente).status_code == 500
+    assert _codigos("email_login") == 0
+
+    # El reintento no queda bloqueado por el cooldown: se vuelve a enviar
+    monkeypatch.setattr(email, "enviar_codigo_email", lambda *args: envios.append(args) or True)
+    respuesta = _login(cliente)
+    assert respuesta.status_code == 200
+    assert respuesta.json()["requiere_totp"] is True
+    assert len(envios) == 2
+    assert _codigos("email_login") == 1
+
+
+def test_no_se_acumulan_mas_de_max_codigos_activos(cliente, usuario_registrado, monkeypatch):
+    from app.routers import verificacion
+
+    monkeypatch.setattr(verificacion, "REENVIO_COOLDOWN_SEGUNDOS", 0)
+    for _ in range(verificacion.MAX_CODIGOS_ACTIVOS + 2):
+        respuesta = cliente.post("/api/verificacion/enviar-codigo-sms", json={"usuario_id": usuario_registrado["id"]})
+        assert respuesta.json()["reenvio_suprimido"] is False
+
+    assert _codigos("telefono") == verificacion.MAX_CODIGOS_ACTIVOS
+
+
+def test_envios_suprimidos_se_cuentan_por_tipo(cliente, usuario_registrado, monkeypatch):
+    from app.routers import verificacion
+
+    monkeypatch.setattr(verificacion, "envios_suprimidos", {})
+    for _ in range(3):
+        cliente.post("/api/verificacion/enviar-codigo-sms", json={"usuario_id": usuario_registrado["id"]})
+
+    estadisticas = cliente.get("/api/verificacion/estadisticas-envios").json()
+    assert estadisticas["envios_suprimidos"] == {"telefono": 2}
+    assert estadisticas["total_suprimidos"] == 2
@@ -0,0 +1,100 @@
+import asyncio
+
+import pytest
+from fastapi import HTTPException
+
+from app import eventos
+from app.auth_utils import crear_token
+from app.database import SessionLocal
+from app.eventos import hub, publicar_al_confirmar
+from app.models import Usuario
+from app.routers.eventos import eventos_usuario
+
+
+@pytest.fixture
+def token_ana(usuario_registrado):
+    return crear_token({"sub": "ana"})
+
+
+def _abrir(usuario_id, token):
+    return eventos_usuario(usuario_id, token=token, authorization=None)
+
+
+def test_la_suscripcion_empieza_con_el_stream(usuario_registrado, token_ana):
+    async def escenario():
+        respuesta = await _abrir(usuario_registrado["id"], token_ana)
+        # Respuesta creada pero nunca enviada: no hay suscripción que limpiar
+        assert hub.estadisticas()["conexiones"] == 0
+
+        flujo = respuesta.body_iterator
+        primero = await flujo.__anext__()
+        assert primero.startswith("event: estado")
+        assert hub.estadisticas()["conexiones"] == 1
+
+        hub.publicar(usuario_registrado["id"], {"email_verificado": True})
+        assert (await flujo.__anext__()).startswith("event: cambio")
+
+        await flujo.aclose()
+        assert hub.estadisticas()["conexiones"] == 0
+
+    asyncio.run(escenario())
+
+
+def test_cambio_entre_suscribir_y_leer_no_se_pierde(usuario_registrado, token_ana, monkeypatch):
+    usuario_id = usuario_registrado["id"]
+    suscribir = hub.suscribir
+
+    def suscribir_y_confirmar_cambio(uid):
+        suscripcion = suscribir(uid)
+        # Otra petición confirma un cambio justo después de suscribirse
+        with SessionLocal() as db:
+            db.query(Usuario).filter(Usuario.id == uid).update({"email_verificado": True})
+            publicar_al_confirmar(db, uid, email_verificado=True)
+            db.commit()
+        return suscripcion
+
+    monkeypatch.setattr(hub, "suscribir", suscribir_y_confirmar_cambio)
+
+    async def escenario():
+        flujo = (await _abrir(usuario_id, token_ana)).body_iterator
+        try:
+            estado = await flujo.__anext__()
+            cambio = await asyncio.wait_for(flujo.__anext__(), 1)
+        finally:
+            await flujo.aclose()
+        # El estado se lee de la primaria después de suscribirse
+        assert '"email_verificado": true' in estado
+        assert cambio.startswith("event: cambio")
+
+    asyncio.run(escenario())
+
+
+def test_requiere_el_token_del_propio_usuario(usuario_registrado):
+    async def escenario():
+        for token, codigo in ((None, 401), ("basura", 401), (crear_token({"sub": "otro"}), 403)):
+            with pytest.raises(HTTPException) as error:
+                await _abrir(usuario_registrado["id"], token)
+            assert error.value.status_code == codigo
+
+        # También con Authorization: Bearer (clientes que no son EventSource)
+        respuesta = await eventos_usuario(
+            usuario_registrado["id"], token=None, authorization=f"Bearer {crear_token({'sub': 'ana'})}"
+        )
+        assert respuesta.media_type == "text/event-stream"
+
+    asyncio.run(escenario())
+
+
+def test_sin_cupo_429(usuario_registrado, token_ana, monkeypatch):
+    monkeypatch.setattr(eventos, "SSE_MAX_POR_USUARIO", 0)
+
+    async def escenario():
+        with pytest.raises(HTTPException) as error:
+            await _abrir(usuario_registrado["id"], token_ana)
+        assert error.value.status_code == 429
+
+    asyncio.run(escenario())
+
+
+def test_ruta_http_sin_token_401(cliente, usuario_registrado):
+    assert cliente.get(f"/api/eventos/{usuario_registrado['id']}").status_code == 401
@@ -0,0 +1,119 @@
+import asyncio
+
+import httpx
+import pytest
+from fastapi import FastAPI, Response
+
+from app import idempotencia
+from app.idempotencia import AlmacenTTL, MiddlewareIdempotencia
+
+llamadas = []
+
+
+def _app_prueba():
+    app = FastAPI()
+
+    @app.post("/crear")
+    async def crear(datos: dict):
+        llamadas.append("crear")
+        return {"numero": len(llamadas)}
+
+    @app.post("/lento")
+    async def lento(datos: dict):
+        llamadas.append("lento")
+        await asyncio.sleep(0.2)
+        return {"numero": len(llamadas)}
+
+    @app.post("/inestable")
+    async def inestable(datos: dict):
+        llamadas.append("inestable")
+        return Response(status_code=503 if len(llamadas) == 1 else 200)
+
+    app.add_middleware(MiddlewareIdempotencia, rutas={"/crear", "/lento", "/inestable"})
+    return app
+
+
+@pytest.fixture(autouse=True)
+def almacen_vacio(monkeypatch):
+    llamadas.clear()
+    monkeypatch.setattr(idempotencia, "almacen", AlmacenTTL())
+
+
+def _ejecutar(*peticiones):
+    """Lanza las peticiones (ruta, clave, cuerpo) a la vez y devuelve las respuestas."""
+    async def escenario():
+        transporte = httpx.ASGITransport(app=_app_prueba())
+        async with httpx.AsyncClient(transport=transporte, base_url="http://prueba") as cliente:
+            return await asyncio.gather(*(
+                cliente.post(ruta, json=cuerpo, headers={"Idempotency-Key": clave})
+                for ruta, clave, cuerpo in peticiones
+            ))
+    return asyncio.run(escenario())
+
+
+def test_reintento_recibe_la_respuesta_guardada():
+    (primera,) = _ejecutar(("/crear", "k1", {"a": 1}))
+    (segunda,) = _ejecutar(("/crear", "k1", {"a": 1}))
+
+    assert segunda.json() == primera.json()
+    assert segunda.headers["Idempotent-Replayed"] == "true"
+    assert llamadas == ["crear"]
+
+
+def test_misma_clave_con_otro_cuerpo_422():
+    _ejecutar(("/crear", "k1", {"a": 1}))
+    (respuesta,) = _ejecutar(("/crear", "k1", {"a": 2}))
+    assert respuesta.status_code == 422
+    assert llamadas == ["crear"]
+
+
+def test_duplicado_concurrente_espera_a_la_original():
+    primera, segunda = _ejecutar(("/lento", "k1", {}), ("/lento", "k1", {}))
+
+    assert llamadas == ["lento"]
+    assert primera.json() == segunda.json()
+    assert "Idempotent-Replayed" in segunda.headers
+
+
+def test_duplicado_que_espera_demasiado_409(monkeypatch):
+    monkeypatch.setattr(idempotencia, "IDEMPOTENCIA_ESPERA_SEGUNDOS", 0.05)
+    respuestas = _ejecutar(("/lento", "k1", {}), ("/lento", "k1", {}))
+    assert sorted(r.status_code for r in respuestas) == [200, 409]
+    assert llamadas == ["lento"]
+
+
+def test_respuesta_5xx_no_se_guarda():
+    (primera,) = _ejecutar(("/inestable", "k1", {}))
+    (segunda,) = _ejecutar(("/inestable", "k1", {}))
+
+    assert (primera.status_code, segunda.status_code) == (503, 200)
+    assert llamadas == ["inestable", "inestable"]
+
+
+def test_rutas_fuera_de_la_lista_no_se_guardan(cliente, usuario_registrado):
+    credenciales = {"usuario": "ana", "contrasena": "secreta123"}
+    for _ in range(2):
+        respuesta = cliente.post("/api/auth/login", json=credenciales, headers={"Idempotency-Key": "k1"})
+        assert "Idempotent-Replayed" not in respuesta.headers
+    assert len(idempotencia.almacen) == 0
+
+
+def test_almacen_acotado_por_bytes():
+    almacen = AlmacenTTL(max_claves=100, ttl=60, max_bytes=10)
+    almacen.guardar("a", "A", tamano=6)
+    almacen.guardar("b", "B", tamano=6)
+
+    assert almacen.obtener("a") is None
+    assert almacen.obtener("b") == "B"
+    assert almacen.bytes == 6
+
+
+def test_registro_con_clave_se_ejecuta_una_vez(cliente):
+    datos = {"usuario": "luis", "nombre": "Luis", "apellidos": "Pérez", "email": "luis@ejemplo.com",
+             "telefono": "+520000000000", "contrasena": "secreta123"}
+    primera = cliente.post("/api/auth/registro", json=datos, headers={"Idempotency-Key": "registro-1"})
+    segunda = cliente.post("/api/auth/registro", json=datos, headers={"Idempotency-Key": "registro-1"})
+
+    assert (primera.status_code, segunda.status_code) == (201, 201)
+    assert segunda.json() == primera.json()
+    assert segunda.headers["Idempotent-Replayed"] == "true"
@@ -0,0 +1,42 @@
+from app.auth_utils import crear_token
+from app.schemas import MAX_LONGITUD_TOKEN, MAX_TOKENS_INTROSPECCION
+
+
+def test_valida_varios_tokens(cliente, usuario_registrado, sin_replicas):
+    respuesta = cliente.post("/api/auth/introspeccion", json={
+        "tokens": [crear_token({"sub": "ana"}), crear_token({"sub": "nadie"}), "basura"]
+    })
+    assert respuesta.status_code == 200
+    activos = [r["active"] for r in respuesta.json()["resultados"]]
+    assert activos == [True, False, False]
+
+
+def test_limites_en_el_esquema(cliente):
+    demasiados = cliente.post("/api/auth/introspeccion", json={"tokens": ["x"] * (MAX_TOKENS_INTROSPECCION + 1)})
+    muy_largo = cliente.post("/api/auth/introspeccion", json={"tokens": ["x" * (MAX_LONGITUD_TOKEN + 1)]})
+    assert demasiados.status_code == 422
+    assert muy_largo.status_code == 422
+
+
+def _token_con_header(header) -> str:
+    import base64
+    import json
+
+    def b64(datos):
+        return base64.urlsafe_b64encode(json.dumps(datos).encode()).rstrip(b"=").decode()
+
+    return f"{b64(header)}.{b64({'sub': 'ana'})}.firma"
+
+
+def test_header_malformado_no_tumba_el_lote(cliente, usuario_registrado, sin_replicas):
+    tokens = [
+        _token_con_header({"alg": "ES256", "kid": ["x"]}),
+        _token_con_header({"alg": "ES256", "kid": {"a": 1}}),
+        _token_con_header({"alg": "ES256"}),
+        _token_con_header(["no", "es", "un", "objeto"]),
+        crear_token({"sub": "ana"}),
+    ]
+    respuesta = cliente.post("/api/auth/introspeccion", json={"tokens": tokens})
+
+    assert respuesta.status_code == 200
+    assert [r["active"] for r in respuesta.json()["resultados"]] == [False, False, False, False, True]
@@ -0,0 +1,52 @@
+import threading
+
+import pytest
+
+from app import precalentamiento
+from app.database import _crear_engine, engine, replicas
+
+
+@pytest.fixture
+def estado_limpio(monkeypatch):
+    monkeypatch.setattr(precalentamiento, "estado",
+                        {"listo": False, "terminado": False, "duracion_ms": None, "errores": []})
+    return precalentamiento.estado
+
+
+def test_compila_las_consultas_en_cada_engine(estado_limpio):
+    for eng in [engine] + [r["engine"] for r in replicas]:
+        eng._compiled_cache.clear()
+
+    precalentamiento.precalentar()
+
+    assert estado_limpio["listo"]
+    assert estado_limpio["errores"] == []
+    for eng in [engine] + [r["engine"] for r in replicas]:
+        assert len(eng._compiled_cache) >= 7
+
+
+def test_no_abre_mas_conexiones_que_el_pool(estado_limpio, monkeypatch):
+    monkeypatch.setattr(precalentamiento, "WARMUP_CONEXIONES", 50)
+    engine.dispose()
+    precalentamiento.precalentar()
+    assert engine.pool.checkedin() == engine.pool.size()
+
+
+def test_ready_503_sin_primaria_y_200_al_recuperarse(cliente, monkeypatch, tmp_path):
+    # Que el precalentamiento del arranque de `cliente` no se cruce con la prueba
+    for hilo in threading.enumerate():
+        if hilo.name == "precalentamiento":
+            hilo.join()
+    estado = {"listo": False, "terminado": False, "duracion_ms": None, "errores": []}
+    monkeypatch.setattr(precalentamiento, "estado", estado)
+
+    caida = _crear_engine(f"sqlite:///{tmp_path / 'no_existe' / 'primaria.db'}")
+    monkeypatch.setattr(precalentamiento, "engine", caida)
+    precalentamiento.precalentar()
+
+    assert estado["terminado"] and not estado["listo"]
+    assert cliente.get("/ready").status_code == 503
+
+    monkeypatch.setattr(precalentamiento, "engine", engine)
+    monkeypatch.setattr(precalentamiento, "WARMUP_REINTENTO_SEGUNDOS", 0)
+    assert cliente.get("/ready").status_code == 200
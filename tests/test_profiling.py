@@ -0,0 +1,80 @@
+import time
+
+import pytest
+
+from app import profiling
+from app.routers import verificacion
+
+
+@pytest.fixture
+def perfiles(tmp_path, monkeypatch):
+    monkeypatch.setattr(profiling, "PROFILING_ADMIN_TOKEN", "secreto")
+    monkeypatch.setattr(profiling, "PROFILING_DIR", str(tmp_path))
+    monkeypatch.setattr(profiling, "PROFILING_INTERVALO_MS", 1)
+    monkeypatch.setitem(profiling.config, "habilitado", True)
+    monkeypatch.setitem(profiling.config, "muestreo", 0.0)
+    return tmp_path
+
+
+def _leer_perfiles(directorio):
+    return [archivo.read_text(encoding="utf-8") for archivo in directorio.glob("*.folded")]
+
+
+def test_desactivado_no_perfila(cliente, perfiles, monkeypatch):
+    monkeypatch.setitem(profiling.config, "habilitado", False)
+    respuesta = cliente.get("/", headers={"X-Profile": "secreto"})
+    assert respuesta.status_code == 200
+    assert _leer_perfiles(perfiles) == []
+
+
+def test_header_con_token_invalido_no_perfila(cliente, perfiles):
+    assert cliente.get("/", headers={"X-Profile": "otro"}).status_code == 200
+    assert _leer_perfiles(perfiles) == []
+
+
+def test_x_profile_perfila_solo_los_hilos_de_la_peticion(cliente, perfiles, usuario_registrado, monkeypatch):
+    def codigo_lento():
+        time.sleep(0.05)
+        return "123456"
+
+    monkeypatch.setattr(verificacion, "generar_codigo", codigo_lento)
+    respuesta = cliente.post(
+        "/api/verificacion/enviar-codigo-sms",
+        json={"usuario_id": usuario_registrado["id"]},
+        headers={"X-Profile": "secreto"},
+    )
+    assert respuesta.status_code == 200
+
+    (contenido,) = _leer_perfiles(perfiles)
+    assert "enviar_codigo_sms" in contenido  # ruta síncrona en el threadpool
+    assert "auditoria-login" not in contenido
+    assert "precalentamiento" not in contenido
+
+
+def test_admin_sin_token_403(cliente, perfiles):
+    assert cliente.get("/admin/profiling/estado").status_code == 403
+    assert cliente.post("/admin/profiling/config", json={"habilitado": False}).status_code == 403
+    assert cliente.get("/admin/profiling/estado", headers={"X-Admin-Token": "secreto"}).status_code == 200
+
+
+def test_stream_sse_suelta_el_muestreador_al_empezar(perfiles):
+    import asyncio
+
+    liberado = []
+
+    async def app_sse(scope, receive, send):
+        await send({"type": "http.response.start", "status": 200,
+                    "headers": [(b"content-type", b"text/event-stream")]})
+        # El stream sigue abierto, pero el profiling ya terminó
+        liberado.append(not profiling._lock_perfil.locked())
+        await send({"type": "http.response.body", "body": b""})
+
+    async def send(mensaje):
+        pass
+
+    scope = {"type": "http", "method": "GET", "path": "/api/eventos/1",
+             "headers": [(b"x-profile", b"secreto")]}
+    asyncio.run(profiling.MiddlewareProfiling(app_sse)(scope, None, send))
+
+    assert liberado == [True]
+    assert _leer_perfiles(perfiles) == []
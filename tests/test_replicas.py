@@ -0,0 +1,57 @@
+from sqlalchemy import event
+
+from app.database import (
+    SessionLocal, SessionLectura, _crear_engine, _registrar_fallo_replica, replicas
+)
+from app.models import Usuario
+
+
+def _crear_usuario(db, usuario="ana"):
+    db.add(Usuario(usuario=usuario, nombre="Ana", apellidos="López",
+                   email=f"{usuario}@ejemplo.com", telefono="+521234567890", contrasena="x"))
+    db.commit()
+
+
+def test_lectura_va_a_la_replica():
+    with SessionLocal() as db:
+        _crear_usuario(db)
+    # La réplica (otra base) aún no tiene la fila
+    with SessionLectura() as db:
+        assert db.query(Usuario).count() == 0
+
+
+def test_lectura_tras_escribir_va_a_la_primaria():
+    with SessionLectura() as db:
+        _crear_usuario(db)
+        assert db.query(Usuario).count() == 1
+
+
+def test_replica_caida_se_reintenta_en_la_primaria(monkeypatch, tmp_path):
+    with SessionLocal() as db:
+        _crear_usuario(db)
+
+    replica = replicas[0]
+    caida = _crear_engine(f"sqlite:///{tmp_path / 'no_existe' / 'replica.db'}")
+    event.listen(caida, "handle_error", _registrar_fallo_replica(replica))
+    monkeypatch.setitem(replica, "engine", caida)
+
+    with SessionLectura() as db:
+        assert db.query(Usuario).count() == 1
+    assert replica["caida_hasta"] > 0
+
+
+def test_la_sesion_conserva_su_replica(monkeypatch):
+    import app.database as database
+
+    elecciones = []
+    original = database.elegir_replica
+
+    def elegir_contando():
+        elecciones.append(1)
+        return original()
+
+    monkeypatch.setattr(database, "elegir_replica", elegir_contando)
+    with SessionLectura() as db:
+        for _ in range(3):
+            db.query(Usuario).count()
+    assert len(elecciones) == 1
@@ -0,0 +1,140 @@
+import time
+
+import pytest
+
+from app.database import SessionLocal
+from app.models import CodigoVerificacion, Usuario
+from app import resiliencia
+from app.resiliencia import CircuitBreaker, CircuitoAbierto
+from app.routers.email import circuito_smtp
+
+
+@pytest.fixture
+def smtp_abierto(monkeypatch):
+    monkeypatch.setattr(circuito_smtp, "estado", "abierto")
+    monkeypatch.setattr(circuito_smtp, "_abierto_desde", time.monotonic())
+    yield circuito_smtp
+
+
+def _proveedor_caido():
+    raise ConnectionError("caído")
+
+
+def _fallar(circuito, veces):
+    for _ in range(veces):
+        with pytest.raises(ConnectionError):
+            circuito.llamar(_proveedor_caido)
+
+
+def test_abre_tras_el_umbral_y_deja_pasar_una_sonda(monkeypatch):
+    monkeypatch.setattr(resiliencia, "circuitos", {})  # no ensuciar /estado/circuitos
+    circuito = CircuitBreaker("prueba", timeout=1, umbral_fallos=2, segundos_abierto=30)
+    _fallar(circuito, 2)
+
+    with pytest.raises(CircuitoAbierto) as error:
+        circuito.llamar(lambda: "ok")
+    assert 29 < error.value.reintentar_en <= 30
+
+    # Pasado el tiempo abierto: una sola sonda; si sale bien se cierra
+    monkeypatch.setattr(circuito, "_abierto_desde", circuito._abierto_desde - 30)
+    assert circuito.segundos_para_sonda() == 0
+    assert circuito.llamar(lambda: "ok") == "ok"
+    assert circuito.estado == "cerrado"
+
+
+def test_smtp_abierto_responde_503_con_retry_after(cliente, usuario_registrado, smtp_abierto):
+    respuesta = cliente.post("/api/verificacion/enviar-codigo-email", json={"usuario_id": usuario_registrado["id"]})
+
+    assert respuesta.status_code == 503
+    assert 1 <= int(respuesta.headers["Retry-After"]) <= 30
+    with SessionLocal() as db:
+        assert db.query(CodigoVerificacion).count() == 0
+
+
+def test_login_por_email_con_smtp_abierto_responde_503(cliente, usuario_registrado, smtp_abierto):
+    with SessionLocal() as db:
+        db.query(Usuario).update({"email_verificado": True})
+        db.commit()
+
+    respuesta = cliente.post("/api/auth/login", json={"usuario": "ana", "contrasena": "secreta123"})
+    assert respuesta.status_code == 503
+    assert "Retry-After" in respuesta.headers
+
+
+def test_estado_circuitos_incluye_todas_las_dependencias(cliente):
+    assert set(cliente.get("/estado/circuitos").json()) == {"base_datos", "smtp", "sms"}
+
+
+@pytest.fixture
+def smtp_simulado(monkeypatch):
+    from app.routers import email
+
+    monkeypatch.setattr(email, "_enviar_smtp", lambda mensaje: None)
+    monkeypatch.setattr(circuito_smtp, "timeout", 0.2)
+    monkeypatch.setattr(circuito_smtp, "umbral_fallos", 2)
+    monkeypatch.setattr(circuito_smtp, "estado", "cerrado")
+    monkeypatch.setattr(circuito_smtp, "fallos", 0)
+    yield circuito_smtp
+
+
+def _enviar_codigo_cronometrado(cliente, usuario_id):
+    inicio = time.monotonic()
+    respuesta = cliente.post("/api/verificacion/enviar-codigo-email", json={"usuario_id": usuario_id})
+    return respuesta, time.monotonic() - inicio
+
+
+def test_latencia_inyectada_por_debajo_del_timeout(cliente, usuario_registrado, smtp_simulado, monkeypatch):
+    monkeypatch.setenv("FALLAS_SMTP", "latencia_ms=50,error=0")
+
+    respuesta, segundos = _enviar_codigo_cronometrado(cliente, usuario_registrado["id"])
+    assert respuesta.status_code == 200
+    assert 0.05 <= segundos < smtp_simulado.timeout
+
+
+def test_fallos_inyectados_abren_el_circuito_y_fallan_rapido(cliente, usuario_registrado, smtp_simulado, monkeypatch):
+    # La latencia supera el timeout: cada intento espera como mucho el timeout y falla
+    monkeypatch.setenv("FALLAS_SMTP", "latencia_ms=1000,error=1")
+
+    for _ in range(smtp_simulado.umbral_fallos):
+        respuesta, segundos = _enviar_codigo_cronometrado(cliente, usuario_registrado["id"])
+        assert respuesta.status_code == 500
+        assert segundos < smtp_simulado.timeout + 0.15
+    assert smtp_simulado.estado == "abierto"
+
+    respuesta, segundos = _enviar_codigo_cronometrado(cliente, usuario_registrado["id"])
+    assert respuesta.status_code == 503
+    assert "Retry-After" in respuesta.headers
+    assert segundos < 0.1
+
+
+def test_envio_smtp_respeta_un_plazo_total(monkeypatch):
+    from app.routers import email
+
+    pasos = []
+
+    class SocketFalso:
+        def settimeout(self, segundos):
+            pasos.append(("timeout", segundos))
+
+    class SMTPLento:
+        def __init__(self, *args, timeout):
+            self.sock = SocketFalso()
+
+        def __enter__(self):
+            return self
+
+        def __exit__(self, *exc):
+            return False
+
+        def starttls(self):
+            time.sleep(0.15)  # agota el plazo total antes del login
+
+        def login(self, *args):
+            pasos.append("login")
+
+    monkeypatch.setattr(email.smtplib, "SMTP", SMTPLento)
+    monkeypatch.setattr(circuito_smtp, "timeout", 0.1)
+
+    with pytest.raises(TimeoutError):
+        email._enviar_smtp(object())
+    assert "login" not in pasos
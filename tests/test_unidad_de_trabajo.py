@@ -0,0 +1,147 @@
+import pyotp
+import pytest
+from sqlalchemy import event
+
+from app.database import SesionEnrutada, SessionLocal
+from app.models import CodigoVerificacion, Usuario
+from app.routers import verificacion
+
+
+@pytest.fixture
+def commits():
+    """Cuenta los commits de las sesiones de la app durante la prueba."""
+    contador = []
+
+    def _contar(sesion):
+        contador.append(sesion)
+
+    event.listen(SesionEnrutada, "after_commit", _contar)
+    yield contador
+    event.remove(SesionEnrutada, "after_commit", _contar)
+
+
+def _actualizar_usuario(usuario_id, **valores):
+    with SessionLocal() as db:
+        db.query(Usuario).filter(Usuario.id == usuario_id).update(valores)
+        db.commit()
+
+
+def _codigo(usuario_id, tipo):
+    with SessionLocal() as db:
+        return db.query(CodigoVerificacion.codigo).filter(
+            CodigoVerificacion.usuario_id == usuario_id, CodigoVerificacion.tipo == tipo
+        ).scalar()
+
+
+def test_registro(cliente, commits):
+    respuesta = cliente.post("/api/auth/registro", json={
+        "usuario": "luis", "nombre": "Luis", "apellidos": "Pérez", "email": "luis@ejemplo.com",
+        "telefono": "+520000000000", "contrasena": "secreta123",
+    })
+    assert respuesta.status_code == 201
+    assert len(commits) == 1
+
+
+def test_registro_duplicado_no_confirma(cliente, usuario_registrado, commits):
+    respuesta = cliente.post("/api/auth/registro", json={
+        "usuario": "ana", "nombre": "Ana", "apellidos": "López", "email": "otra@ejemplo.com",
+        "telefono": "+520000000000", "contrasena": "secreta123",
+    })
+    assert respuesta.status_code == 400
+    assert commits == []
+
+
+def test_verificacion_sms(cliente, usuario_registrado, commits):
+    usuario_id = usuario_registrado["id"]
+    assert cliente.post("/api/verificacion/enviar-codigo-sms", json={"usuario_id": usuario_id}).status_code == 200
+    assert len(commits) == 1
+
+    incorrecto = cliente.post("/api/verificacion/verificar-codigo-sms", json={"usuario_id": usuario_id, "codigo": "xxxxxx"})
+    assert incorrecto.status_code == 400
+    assert len(commits) == 1
+
+    codigo = _codigo(usuario_id, "telefono")
+    correcto = cliente.post("/api/verificacion/verificar-codigo-sms", json={"usuario_id": usuario_id, "codigo": codigo})
+    assert correcto.status_code == 200
+    assert len(commits) == 2
+
+    ya_verificado = cliente.post("/api/verificacion/enviar-codigo-sms", json={"usuario_id": usuario_id})
+    assert ya_verificado.status_code == 400
+    assert len(commits) == 2
+
+
+def test_verificacion_email(cliente, usuario_registrado, commits, monkeypatch):
+    usuario_id = usuario_registrado["id"]
+    monkeypatch.setattr(verificacion, "enviar_codigo_email", lambda **datos: True)
+    assert cliente.post("/api/verificacion/enviar-codigo-email", json={"usuario_id": usuario_id}).status_code == 200
+    assert len(commits) == 1
+
+    incorrecto = cliente.post("/api/verificacion/verificar-codigo-email", json={"usuario_id": usuario_id, "codigo": "xxxxxx"})
+    assert incorrecto.status_code == 400
+    assert len(commits) == 1
+
+    codigo = _codigo(usuario_id, "email")
+    correcto = cliente.post("/api/verificacion/verificar-codigo-email", json={"usuario_id": usuario_id, "codigo": codigo})
+    assert correcto.status_code == 200
+    assert len(commits) == 2
+
+    ya_verificado = cliente.post("/api/verificacion/enviar-codigo-email", json={"usuario_id": usuario_id})
+    assert ya_verificado.status_code == 400
+    assert len(commits) == 2
+
+
+def test_fallo_smtp_no_confirma(cliente, usuario_registrado, commits, monkeypatch):
+    monkeypatch.setattr(verificacion, "enviar_codigo_email", lambda **datos: False)
+    respuesta = cliente.post("/api/verificacion/enviar-codigo-email", json={"usuario_id": usuario_registrado["id"]})
+    assert respuesta.status_code == 500
+    assert commits == []
+    assert _codigo(usuario_registrado["id"], "email") is None
+
+
+def test_fallo_del_commit_devuelve_500(usuario_registrado, commits, monkeypatch):
+    from fastapi.testclient import TestClient
+    from app.main import app
+
+    def _commit_fallido(sesion):
+        raise RuntimeError("la base rechazó el commit")
+
+    monkeypatch.setattr(SesionEnrutada, "commit", _commit_fallido)
+    with TestClient(app, raise_server_exceptions=False) as cliente:
+        respuesta = cliente.post("/api/verificacion/enviar-codigo-sms", json={"usuario_id": usuario_registrado["id"]})
+    assert respuesta.status_code == 500
+
+
+def test_activacion_totp(cliente, usuario_registrado, commits):
+    habilitar = cliente.post("/api/totp/habilitar", json={"email": "ana@ejemplo.com"})
+    assert habilitar.status_code == 200
+    assert len(commits) == 1
+
+    incorrecto = cliente.post("/api/totp/verificar", json={"email": "ana@ejemplo.com", "codigo": "000000x"})
+    assert incorrecto.status_code == 400
+    assert len(commits) == 1
+
+    codigo = pyotp.TOTP(habilitar.json()["secreto"]).now()
+    correcto = cliente.post("/api/totp/verificar", json={"email": "ana@ejemplo.com", "codigo": codigo})
+    assert correcto.status_code == 200
+    assert len(commits) == 2
+
+
+def test_login_con_codigo_por_email(cliente, usuario_registrado, commits, monkeypatch):
+    from app.routers import email
+
+    _actualizar_usuario(usuario_registrado["id"], email_verificado=True)
+    monkeypatch.setattr(email, "enviar_codigo_email", lambda *datos: True)
+    commits.clear()
+    credenciales = {"usuario": "ana", "contrasena": "secreta123"}
+
+    assert cliente.post("/api/auth/login", json=credenciales).json()["requiere_totp"] is True
+    assert len(commits) == 1
+
+    incorrecto = cliente.post("/api/auth/login", json={**credenciales, "codigo_totp": "xxxxxx"})
+    assert incorrecto.status_code == 401
+    assert len(commits) == 1
+
+    codigo = _codigo(usuario_registrado["id"], "email_login")
+    correcto = cliente.post("/api/auth/login", json={**credenciales, "codigo_totp": codigo})
+    assert correcto.json()["access_token"]
+    assert len(commits) == 2